@@ -0,0 +1,172 @@
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+
+from sqlalchemy.exc import OperationalError
+
+from .settings import ACTIVITY_LOG_BATCH_SIZE, ACTIVITY_LOG_FLUSH_SECONDS, ACTIVITY_LOG_MAX_BUFFER
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogWriter:
+    """
+    Buffers activity log entries and writes them in batched inserts.
+
+    Requests only append to an in-memory buffer; a background thread inserts
+    everything buffered every ACTIVITY_LOG_FLUSH_SECONDS (or as soon as a batch
+    fills up) with one INSERT and one commit. close() flushes whatever is left
+    and is called on application shutdown and at interpreter exit.
+
+    If the database is unreachable, the batch is kept and retried on the next
+    flush. If the batch itself is rejected, its entries are written one by
+    one and only the entries that still fail (e.g. for a deleted user) are
+    dropped, so one bad entry cannot hold up the rest.
+    """
+
+    def __init__(self, session_factory, flush_interval: float = 1.0, batch_size: int = 100, max_buffer: int = 10000):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.written = 0
+        self.failed_flushes = 0
+        self.rejected = 0
+        self.dropped = 0
+        self._buffer: Deque[dict] = deque(maxlen=max_buffer)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, user_id: int, action: str, details: Optional[str] = None):
+        """Queues an entry, timestamped now rather than when it is written."""
+        entry = {
+            "user_id": user_id,
+            "action": action,
+            "details": details,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                # The database has been unreachable for a long time; the deque drops the oldest entry
+                self.dropped += 1
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if self._closed:
+            self.flush()
+            return
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes every buffered entry now and returns how many were written."""
+        with self._flush_lock:
+            with self._lock:
+                entries = list(self._buffer)
+                self._buffer.clear()
+            if not entries:
+                return 0
+            # Imported here to avoid a circular import with crud
+            from . import crud
+
+            db = self.session_factory()
+            try:
+                crud.bulk_create_activity_logs(db, entries)
+                written = len(entries)
+            except OperationalError as e:
+                db.rollback()
+                self._requeue(entries, e)
+                return 0
+            except Exception as e:
+                db.rollback()
+                logger.warning("Activity log batch of %d entries was rejected (%s); writing them one by one", len(entries), e)
+                written = self._write_each(db, crud, entries)
+            finally:
+                db.close()
+            self.written += written
+            return written
+
+    def _write_each(self, db, crud, entries: List[dict]) -> int:
+        written = 0
+        for index, entry in enumerate(entries):
+            try:
+                crud.bulk_create_activity_logs(db, [entry])
+                written += 1
+            except OperationalError as e:
+                db.rollback()
+                self._requeue(entries[index:], e)
+                break
+            except Exception as e:
+                db.rollback()
+                self.rejected += 1
+                logger.error("Dropping activity log entry %s %r: %s", entry["action"], entry["details"], e)
+        return written
+
+    def _requeue(self, entries: List[dict], error: Exception):
+        self.failed_flushes += 1
+        logger.error("Could not write %d activity log entries, will retry: %s", len(entries), error)
+        with self._lock:
+            # Put them back in front of anything logged meanwhile, keeping the newest entries
+            combined = entries + list(self._buffer)
+            self.dropped += max(0, len(combined) - self.max_buffer)
+            self._buffer = deque(combined, maxlen=self.max_buffer)
+
+    def close(self):
+        """Stops the background thread and writes any remaining entries."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "buffered": buffered,
+            "written": self.written,
+            "failed_flushes": self.failed_flushes,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+        }
+
+
+def _create_writer() -> ActivityLogWriter:
+    from .database import SessionLocal
+
+    writer = ActivityLogWriter(
+        SessionLocal,
+        flush_interval=ACTIVITY_LOG_FLUSH_SECONDS,
+        batch_size=ACTIVITY_LOG_BATCH_SIZE,
+        max_buffer=ACTIVITY_LOG_MAX_BUFFER,
+    )
+    atexit.register(writer.close)
+    return writer
+
+
+writer = _create_writer()
+
+
+def record(user, action: str, details: Optional[str] = None):
+    """Logs an admin action without touching the database on the request path."""
+    writer.record(user.id, action, details)
@@ -0,0 +1,69 @@
+# Async versions of the crud functions used by the public endpoints (DB_ASYNC=true).
+# They run the statements built in api/crud.py, so both paths query the same way.
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import cache, crud, events, models, schemas
+from .pagination import Cursor
+
+
+async def get_post_summaries(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None):
+    """Retrieve a page of posts with authors, media and visible comment counts, but no comments."""
+    result = await db.execute(crud.post_summaries_statement(skip, limit, cursor))
+    return crud._with_comment_counts(result.all())
+
+
+async def get_comments(db: AsyncSession, post_id: Optional[int] = None, is_inappropriate: Optional[bool] = None, skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None) -> List[models.Comment]:
+    result = await db.scalars(crud.comments_statement(post_id, is_inappropriate, skip, limit, cursor))
+    return list(result.all())
+
+
+async def get_post_detail(db: AsyncSession, post_id: int, comment_skip: int = 0, comment_limit: int = 50):
+    """Retrieve a single post with its visible comment count and one page of its visible comments."""
+    row = (await db.execute(crud.post_detail_statement(post_id))).first()
+    if row is None:
+        return None, []
+    db_post = crud._with_comment_counts([row])[0]
+    comments = await get_comments(db, post_id=post_id, is_inappropriate=False, skip=comment_skip, limit=comment_limit)
+    return db_post, comments
+
+
+async def post_exists(db: AsyncSession, post_id: int) -> bool:
+    result = await db.execute(crud.post_exists_statement(post_id))
+    return result.first() is not None
+
+
+async def get_officials(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[models.Official]:
+    """Retrieve a list of all officials."""
+    result = await db.scalars(crud.officials_statement(skip, limit))
+    return list(result.all())
+
+
+async def get_content_version(db: AsyncSession, namespace: str):
+    """Returns the (version, updated_at) of a namespace, used to build ETags without loading content."""
+    row = (await db.execute(crud.content_version_query(namespace))).one()
+    return row.version, row.updated_at
+
+
+async def bump_content_version(db: AsyncSession, namespace: str):
+    """Bumps a content version as part of the caller's pending transaction."""
+    await db.execute(crud.content_version_bump(db.get_bind().dialect.name, namespace))
+
+
+async def create_comment(db: AsyncSession, comment: schemas.CommentCreate, post_id: int) -> models.Comment:
+    db_comment = crud.new_comment(comment, post_id)
+    db.add(db_comment)
+    await bump_content_version(db, crud.COMMENTS_VERSION)
+    await db.flush()  # Assigns the id and created_at the live comment streams send
+    events.notify_comment_change(db, events.COMMENT_CREATED, db_comment)
+    await db.commit()
+    # The cache backend may do blocking network I/O (Redis), so keep it off the event loop
+    await run_in_threadpool(cache.invalidate_posts)
+    return db_comment
+
+
+async def get_document_request_by_token(db: AsyncSession, request_token: str) -> Optional[models.DocumentRequest]:
+    result = await db.scalars(crud.document_request_by_token_statement(request_token))
+    return result.first()
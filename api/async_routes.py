@@ -0,0 +1,134 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import async_crud, cache, conditional, schemas
+from .database import AsyncSessionLocal
+from .pagination import NEXT_CURSOR_HEADER, parse_cursor, with_next_cursor
+
+# Async versions of the public endpoints in api/main.py. They are swapped in by
+# install() when DB_ASYNC is enabled, so a single worker can keep many slow
+# database round trips in flight without holding a threadpool thread for each.
+router = APIRouter()
+
+
+async def get_async_db():
+    """Dependency to get an async DB session for each request."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def _cache_call(func, *args):
+    # The in-process cache never blocks, but the Redis backend does network I/O
+    if isinstance(cache.public_cache, cache.TTLCache):
+        return func(*args)
+    return await run_in_threadpool(func, *args)
+
+
+async def _content_validators(request: Request, db: AsyncSession, namespace: str) -> dict:
+    version, updated_at = await async_crud.get_content_version(db, namespace)
+    return conditional.make_validators(namespace, version, updated_at, request)
+
+
+@router.get("/posts/", response_model=List[schemas.PostSummary], tags=["Public"])
+async def read_posts(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Reads post summaries (no comment lists, only counts) with pagination."""
+    key = cache.cache_key(cache.POSTS_NAMESPACE, request)
+    cached = await _cache_call(cache.cached_or_not_modified, request, key)
+    if cached is not None:
+        return cached
+
+    generation = await _cache_call(cache.public_cache.generation, cache.POSTS_NAMESPACE)
+    validators = await _content_validators(request, db, cache.POSTS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
+    posts = await async_crud.get_post_summaries(db, skip=skip, limit=limit, cursor=parse_cursor(cursor))
+    headers = with_next_cursor(validators, posts, "created_at", limit)
+    return await _cache_call(cache.cache_response, key, generation, schemas.PostSummaryList, posts, headers)
+
+
+@router.get("/posts/{post_id}", response_model=schemas.PostDetail, tags=["Public"])
+async def read_post(
+    request: Request,
+    post_id: int,
+    comment_skip: int = Query(0, ge=0),
+    comment_limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Reads a single post and a page of its comments."""
+    key = cache.cache_key(cache.POSTS_NAMESPACE, request)
+    cached = await _cache_call(cache.cached_or_not_modified, request, key)
+    if cached is not None:
+        return cached
+
+    generation = await _cache_call(cache.public_cache.generation, cache.POSTS_NAMESPACE)
+    validators = await _content_validators(request, db, cache.POSTS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
+    db_post, comments = await async_crud.get_post_detail(
+        db, post_id=post_id, comment_skip=comment_skip, comment_limit=comment_limit
+    )
+    if db_post is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    post_detail = schemas.post_detail(db_post, comments)
+    return await _cache_call(cache.cache_response, key, generation, schemas.PostDetailAdapter, post_detail, validators)
+
+
+@router.post("/posts/{post_id}/comments/", response_model=schemas.Comment, status_code=status.HTTP_201_CREATED, tags=["Public"])
+async def create_comment_for_post(
+    post_id: int, comment: schemas.CommentCreate, db: AsyncSession = Depends(get_async_db)
+):
+    """Creates a comment on a specific post."""
+    if not await async_crud.post_exists(db, post_id=post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
+    return await async_crud.create_comment(db=db, comment=comment, post_id=post_id)
+
+
+@router.get("/document-requests/status/{request_token}", response_model=schemas.DocumentRequest, tags=["Public Document Requests"])
+async def get_document_request_status(request_token: str, db: AsyncSession = Depends(get_async_db)):
+    """Fetches the status of a document request using its token."""
+    db_request = await async_crud.get_document_request_by_token(db, request_token=request_token)
+    if db_request is None:
+        raise HTTPException(status_code=404, detail="Request token not found.")
+    return db_request
+
+
+@router.get("/officials/", response_model=List[schemas.Official], tags=["Officials"])
+async def read_officials(request: Request, skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get a list of all barangay officials. This is a public endpoint.
+    """
+    key = cache.cache_key(cache.OFFICIALS_NAMESPACE, request)
+    cached = await _cache_call(cache.cached_or_not_modified, request, key)
+    if cached is not None:
+        return cached
+
+    generation = await _cache_call(cache.public_cache.generation, cache.OFFICIALS_NAMESPACE)
+    validators = await _content_validators(request, db, cache.OFFICIALS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
+    officials = await async_crud.get_officials(db, skip=skip, limit=limit)
+    return await _cache_call(cache.cache_response, key, generation, schemas.OfficialList, officials, validators)
+
+
+def install(app: FastAPI):
+    """Replaces the app's synchronous versions of these endpoints with the async ones."""
+    replaced = {
+        (route.path, method)
+        for route in router.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    app.router.routes = [
+        route for route in app.router.routes
+        if not (isinstance(route, APIRoute) and any((route.path, method) in replaced for method in route.methods))
+    ]
+    app.include_router(router)
@@ -0,0 +1,144 @@
+# Content-addressed uploads: each distinct file is stored once, under its hash
+import hashlib
+import os
+from typing import AsyncIterator, BinaryIO, NamedTuple, Tuple
+
+from fastapi import HTTPException, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from . import crud, storage
+from .database import SessionLocal
+from .settings import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+BLOB_FOLDER = "media"
+UPLOAD_FIELD = "file"
+# Room for the multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+# Documents the multipart body the upload endpoints read themselves
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": [UPLOAD_FIELD],
+                    "properties": {UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+
+class HashedUpload(NamedTuple):
+    file: UploadFile
+    sha256: str
+    size: int
+
+
+class BodyTooLarge(MultiPartException):
+    """
+    Raised from the request body stream once it passes the upload limit. It
+    is a MultiPartException so that the parser closes the files it spooled.
+    """
+
+
+async def limit_body(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Passes the body through, stopping as soon as more than max_bytes arrived."""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_bytes:
+            raise BodyTooLarge(f"Request body is larger than {max_bytes} bytes.")
+        yield chunk
+
+
+def hash_file(file: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, int]:
+    """Returns the SHA-256 and size of a file, leaving it rewound for the next reader."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+async def receive_upload(request: Request) -> AsyncIterator[HashedUpload]:
+    """
+    Dependency that parses the uploaded file from the request body, then
+    hashes and measures the spooled copy. Bodies over MAX_UPLOAD_BYTES get a
+    413 as soon as that is known: up front from Content-Length, or while the
+    body is still arriving otherwise.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail=str(storage.UploadTooLarge(MAX_UPLOAD_BYTES)))
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload.")
+
+    body = limit_body(request.stream(), MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)
+    try:
+        form = await MultiPartParser(request.headers, body).parse()
+    except BodyTooLarge:
+        raise HTTPException(status_code=413, detail=str(storage.UploadTooLarge(MAX_UPLOAD_BYTES)))
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=e.message)
+    try:
+        file = form.get(UPLOAD_FIELD)
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=422, detail=f"A file is required in the '{UPLOAD_FIELD}' field.")
+        sha256, size = await run_in_threadpool(hash_file, file.file)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=str(storage.UploadTooLarge(MAX_UPLOAD_BYTES)))
+        yield HashedUpload(file, sha256, size)
+    finally:
+        await form.close()
+
+
+async def store_upload(upload: HashedUpload, db: Session) -> storage.StoredFile:
+    """
+    Stores an upload under its content hash. A file that is already stored
+    is not transferred again; its existing location is returned instead.
+    """
+    file, sha256, size = upload
+    db_blob = await run_in_threadpool(crud.claim_media_blob, db, sha256)
+    if db_blob is not None:
+        return storage.StoredFile(db_blob.path, db_blob.url, is_new=False)
+
+    path = f"{BLOB_FOLDER}/{sha256}{os.path.splitext(file.filename or '')[1].lower()}"
+    url = await storage.backend.upload(path, storage.iter_upload(file), content_type=file.content_type, size=size)
+    db_blob = await run_in_threadpool(crud.create_media_blob, db, sha256, path, url, file.content_type, size)
+    if db_blob.path != path:
+        # An identical file with another extension won the race; use that one
+        await storage.backend.delete([path])
+        return storage.StoredFile(db_blob.path, db_blob.url, is_new=False)
+    return storage.StoredFile(path, url)
+
+
+def _collect_orphans():
+    db = SessionLocal()
+    try:
+        return crud.collect_orphan_media(db)
+    finally:
+        db.close()
+
+
+async def collect_garbage() -> int:
+    """Deletes stored files (and their variants) no longer used anywhere; returns how many."""
+    urls = await run_in_threadpool(_collect_orphans)
+    if urls:
+        try:
+            await storage.delete_urls(urls)
+        except Exception as e:
+            print(f"ERROR deleting {len(urls)} unused files from storage: {e}")
+    return len(urls)
@@ -0,0 +1,383 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from fastapi import Request, Response
+from fastapi.dependencies.utils import get_flat_dependant
+from pydantic import TypeAdapter
+
+from .conditional import is_not_modified, not_modified_response
+
+from .settings import (
+    CACHE_BACKEND,
+    PUBLIC_CACHE_MAX_ENTRIES,
+    PUBLIC_CACHE_TTL_SECONDS,
+    REDIS_CACHE_PREFIX,
+    REDIS_SOCKET_TIMEOUT_SECONDS,
+    REDIS_URL,
+    USER_CACHE_MAX_ENTRIES,
+    USER_CACHE_TTL_SECONDS,
+)
+
+try:
+    import redis
+except ImportError:  # redis is only needed for CACHE_BACKEND=redis
+    redis = None
+
+# Namespaces group cache entries by the data they were built from, so a write
+# only has to invalidate the namespaces it touches.
+POSTS_NAMESPACE = "posts"
+OFFICIALS_NAMESPACE = "officials"
+USERS_NAMESPACE = "users"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+
+    def to_response(self) -> Response:
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+    def encode(self) -> bytes:
+        # JSON never contains a raw newline, so it safely separates headers from the body
+        return json.dumps(self.headers).encode("utf-8") + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "CachedResponse":
+        headers, body = raw.split(b"\n", 1)
+        return cls(body=body, headers=json.loads(headers))
+
+
+class TTLCache:
+    """
+    A bounded, in-process LRU cache whose entries expire after a fixed time to live.
+
+    Keys are tuples starting with a namespace and values are bytes. Each
+    namespace has a generation counter that is bumped on invalidation; a value
+    computed before an invalidation is dropped instead of being stored, so a
+    slow reader can never put stale data back into the cache.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, value: bytes, generation: Optional[int] = None, ttl: Optional[float] = None):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key[0], 0):
+                return
+            self._entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *namespaces: str):
+        """Drops every entry in the given namespaces."""
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in [key for key in self._entries if key[0] in namespaces]:
+                del self._entries[key]
+            listeners = list(self._listeners)
+        for namespace in namespaces:
+            for listener in listeners:
+                listener(namespace)
+
+    def add_invalidation_listener(self, listener: Callable[[str], None]):
+        """Registers a callback run with the namespace name whenever it is invalidated."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def clear(self):
+        with self._lock:
+            for namespace in {key[0] for key in self._entries}:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+            }
+
+
+class RedisCache:
+    """
+    A cache shared by every worker through Redis.
+
+    Each namespace's generation lives in Redis and is part of every entry key,
+    so invalidating a namespace is a single INCR: old entries simply stop
+    being addressable and expire on their own. The new generation is
+    published so other workers pick it up without polling. Redis errors are
+    treated as cache misses so an outage never fails a request.
+    """
+
+    def __init__(self, url: str, ttl: float = 30.0, prefix: str = "skonnect:cache", socket_timeout: float = 0.5):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND is set to 'redis' but the redis package is not installed.")
+        self.ttl = ttl
+        self.prefix = prefix
+        self.channel = f"{prefix}:invalidations"
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # Timeouts turn a hung Redis into errors (cache misses) instead of hung requests
+        self.client = redis.Redis.from_url(url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout)
+        self._generations: Dict[str, int] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._subscriber: Optional[threading.Thread] = None
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:generation:{namespace}"
+
+    def _entry_key(self, key: tuple, generation: int) -> str:
+        namespace, rest = key[0], key[1:]
+        return f"{self.prefix}:{namespace}:{generation}:{json.dumps(rest, separators=(',', ':'))}"
+
+    def _ensure_subscriber(self):
+        # Started lazily so that importing the app never opens a Redis connection
+        if self._subscriber is not None:
+            return
+        with self._lock:
+            if self._subscriber is None:
+                self._subscriber = threading.Thread(target=self._listen, name="cache-invalidations", daemon=True)
+                self._subscriber.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Generations may have moved while we were not subscribed
+                with self._lock:
+                    self._generations.clear()
+                while True:
+                    # Polls instead of listen(), whose blocking read would trip the socket timeout
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    namespace, generation = message["data"].decode("utf-8").rsplit(":", 1)
+                    self._apply_generation(namespace, int(generation))
+            except Exception as e:
+                print(f"Cache invalidation subscriber error: {e}")
+                time.sleep(1)
+
+    def _apply_generation(self, namespace: str, generation: int):
+        with self._lock:
+            if generation <= self._generations.get(namespace, -1):
+                return
+            self._generations[namespace] = generation
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(namespace)
+
+    def generation(self, namespace: str) -> int:
+        self._ensure_subscriber()
+        with self._lock:
+            generation = self._generations.get(namespace)
+        if generation is None:
+            try:
+                generation = int(self.client.get(self._generation_key(namespace)) or 0)
+            except Exception as e:
+                self.errors += 1
+                print(f"Cache error reading generation of '{namespace}': {e}")
+                return -1
+            with self._lock:
+                generation = max(generation, self._generations.get(namespace, 0))
+                self._generations[namespace] = generation
+        return generation
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        generation = self.generation(key[0])
+        value = None
+        if generation >= 0:
+            try:
+                value = self.client.get(self._entry_key(key, generation))
+            except Exception as e:
+                self.errors += 1
+                print(f"Cache error reading '{key[0]}': {e}")
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: tuple, value: bytes, generation: Optional[int] = None, ttl: Optional[float] = None):
+        current = self.generation(key[0])
+        if current < 0 or (generation is not None and generation != current):
+            return
+        try:
+            self.client.set(self._entry_key(key, current), value, px=int((ttl or self.ttl) * 1000))
+        except Exception as e:
+            self.errors += 1
+            print(f"Cache error writing '{key[0]}': {e}")
+
+    def invalidate(self, *namespaces: str):
+        """Moves the given namespaces to a new generation and notifies every worker."""
+        for namespace in namespaces:
+            try:
+                generation = self.client.incr(self._generation_key(namespace))
+                self.client.publish(self.channel, f"{namespace}:{generation}")
+            except Exception as e:
+                self.errors += 1
+                print(f"Cache error invalidating '{namespace}': {e}")
+                with self._lock:
+                    self._generations.pop(namespace, None)
+                continue
+            self._apply_generation(namespace, generation)
+
+    def add_invalidation_listener(self, listener: Callable[[str], None]):
+        """Registers a callback run with the namespace name whenever any worker invalidates it."""
+        with self._lock:
+            self._listeners.append(listener)
+        self._ensure_subscriber()
+
+    def clear(self):
+        with self._lock:
+            namespaces = list(self._generations)
+        self.invalidate(*namespaces)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "ttl_seconds": self.ttl,
+        }
+
+
+def create_cache_backend(maxsize: int, ttl: float, prefix: str):
+    """Builds a cache of the backend selected by the CACHE_BACKEND setting."""
+    if CACHE_BACKEND == "redis":
+        return RedisCache(REDIS_URL, ttl=ttl, prefix=prefix, socket_timeout=REDIS_SOCKET_TIMEOUT_SECONDS)
+    if CACHE_BACKEND == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    raise RuntimeError(f"Unknown CACHE_BACKEND '{CACHE_BACKEND}'. Use 'memory' or 'redis'.")
+
+
+public_cache = create_cache_backend(PUBLIC_CACHE_MAX_ENTRIES, PUBLIC_CACHE_TTL_SECONDS, REDIS_CACHE_PREFIX)
+# Principals get their own cache so that public responses can never evict them
+user_cache = create_cache_backend(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS, f"{REDIS_CACHE_PREFIX}:users")
+
+
+# Routes are created once at startup and never compare by identity, so they are memoized by id()
+_route_query_params: Dict[int, tuple] = {}
+
+
+def _declared_query_params(route) -> tuple:
+    names = _route_query_params.get(id(route))
+    if names is None:
+        dependant = getattr(route, "dependant", None)
+        params = get_flat_dependant(dependant).query_params if dependant is not None else []
+        names = _route_query_params[id(route)] = tuple(sorted({param.alias for param in params}))
+    return names
+
+
+def cache_key(namespace: str, request: Request) -> tuple:
+    """
+    Builds a cache key from the request path and the query parameters the endpoint declares.
+
+    Undeclared parameters are left out, so appending ?x=1, ?x=2, ... cannot
+    create new entries. A repeated parameter keys on its last value, which is
+    the one the endpoint receives.
+    """
+    names = _declared_query_params(request.scope.get("route"))
+    return (namespace, request.url.path, tuple((name, request.query_params.get(name)) for name in names))
+
+
+def get_response(key: tuple) -> Optional[Response]:
+    raw = public_cache.get(key)
+    if raw is None:
+        return None
+    return CachedResponse.decode(raw).to_response()
+
+
+def store_response(key: tuple, generation: int, body: bytes, headers: Optional[dict] = None) -> Response:
+    entry = CachedResponse(body=body, headers=headers or {})
+    public_cache.set(key, entry.encode(), generation=generation)
+    return entry.to_response()
+
+
+def _token_key(token: str) -> tuple:
+    # Tokens are hashed so that a shared cache never holds usable credentials
+    return (USERS_NAMESPACE, hashlib.sha256(token.encode("utf-8")).hexdigest())
+
+
+def cache_response(key: tuple, generation: int, adapter: TypeAdapter, data, headers: Optional[dict] = None) -> Response:
+    """Serializes a response body once, stores it in the public cache and returns it."""
+    body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return store_response(key, generation, body, headers)
+
+
+def cached_or_not_modified(request: Request, key: tuple) -> Optional[Response]:
+    """Returns a cached response, or a 304 if the client already has it."""
+    cached = get_response(key)
+    if cached is not None and is_not_modified(request, cached.headers):
+        return not_modified_response(cached.headers)
+    return cached
+
+
+# Striped locks so that parallel requests carrying the same token wait for a
+# single user lookup instead of all querying the database at once
+_user_lookup_locks = [threading.Lock() for _ in range(64)]
+
+
+def user_lookup_lock(token: str) -> threading.Lock:
+    return _user_lookup_locks[hash(token) % len(_user_lookup_locks)]
+
+
+def get_user(token: str) -> Optional[bytes]:
+    return user_cache.get(_token_key(token))
+
+
+def store_user(token: str, generation: int, user_json: bytes, ttl: Optional[float] = None):
+    """Caches a principal for a token, never for longer than USER_CACHE_TTL_SECONDS."""
+    ttl = USER_CACHE_TTL_SECONDS if ttl is None else min(ttl, USER_CACHE_TTL_SECONDS)
+    if ttl <= 0:
+        return
+    user_cache.set(_token_key(token), user_json, generation=generation, ttl=ttl)
+
+
+def invalidate_posts():
+    public_cache.invalidate(POSTS_NAMESPACE)
+
+
+def invalidate_officials():
+    public_cache.invalidate(OFFICIALS_NAMESPACE)
+
+
+def invalidate_users():
+    user_cache.invalidate(USERS_NAMESPACE)
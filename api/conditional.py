@@ -0,0 +1,56 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def make_validators(namespace: str, version: int, updated_at: Optional[datetime], request: Request) -> Dict[str, str]:
+    """
+    Builds ETag/Last-Modified headers for a response from its content version.
+
+    The ETag combines the namespace version with the request path and query,
+    so every page of a list has its own tag but none of them require the body
+    to be serialized first.
+    """
+    target = f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+    digest = hashlib.sha256(target.encode("utf-8")).hexdigest()[:16]
+    headers = {
+        "ETag": f'"{namespace}-{version}-{digest}"',
+        # Always revalidate, which with a matching ETag is a cheap 304
+        "Cache-Control": "no-cache",
+    }
+    if updated_at is not None:
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    """Checks the request's If-None-Match (or If-Modified-Since) against response validators."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers.get("ETag") or headers.get("etag")
+        if etag is None:
+            return False
+        candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+        return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified") or headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    validators = {
+        name: value for name, value in headers.items()
+        if name.lower() in ("etag", "last-modified", "cache-control")
+    }
+    return Response(status_code=304, headers=validators)
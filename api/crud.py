@@ -1,35 +1,37 @@
-from sqlalchemy.orm import Session
-from typing import Optional, List
-from . import models, schemas, security
-from supabase import create_client, Client
-import os
-import re
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-SUPABASE_BUCKET_NAME = os.getenv("SUPABASE_BUCKET_NAME", "post-media")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# Load swear words from a file
-def load_swear_words(file_path="src/assets/swearwords.txt"):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return set(word.strip().lower() for word in f if word.strip())
-    except FileNotFoundError:
-        print(f"Warning: swearwords.txt not found at {file_path}. No profanity filtering will be applied.")
-        return set()
+from collections import Counter, defaultdict
+from sqlalchemy import case, cast, delete, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, make_transient_to_detached, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Iterable, Optional, List
+from datetime import datetime, timedelta, timezone
+from . import cache, events, models, schemas, search, security
+from .pagination import Cursor, apply_keyset
+from .profanity import ProfanityMatcher, ProfanityMatch
+from .settings import DOCUMENT_SEARCH_MIN_SIMILARITY, MEDIA_BLOB_GC_GRACE_SECONDS, SWEAR_WORDS_PATH
 
-# Global set of swear words
-BAD_WORDS = load_swear_words()
+# Profanity matcher, built from the swear words file on startup (or first use)
+# and reloadable at runtime
+profanity_matcher = ProfanityMatcher(SWEAR_WORDS_PATH, lazy=True)
 
 def check_for_inappropriate_words(text: str) -> bool:
     """Checks if a given text contains any inappropriate words."""
-    if not BAD_WORDS:
-        return False # No filtering if no bad words are loaded
-    
-    # Create a regex pattern to match whole words, case-insensitive
-    pattern = r'\b(?:' + '|'.join(re.escape(word) for word in BAD_WORDS) + r')\b'
-    return bool(re.search(pattern, text, re.IGNORECASE))
+    return profanity_matcher.contains_match(text)
+
+def find_inappropriate_words(text: str) -> List[ProfanityMatch]:
+    """Returns the inappropriate words found in a text along with their positions."""
+    return profanity_matcher.find_matches(text)
+
+def reload_swear_words(only_if_changed: bool = False) -> int:
+    """Reloads the swear words file without restarting and returns the word count."""
+    if only_if_changed:
+        profanity_matcher.reload_if_changed()
+    else:
+        profanity_matcher.reload()
+    return len(profanity_matcher.words)
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
@@ -56,126 +58,565 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user_by_username(db, username)
-    if not user:
-        return False
-    if not security.verify_password(password, user.hashed_password):
-        return False
-    return user
+def approve_user(db: Session, db_user: models.User):
+    """Approves an admin account and drops every cached principal."""
+    db_user.is_approved = True
+    db.commit()
+    cache.invalidate_users()
+    db.refresh(db_user)
+    return db_user
+
+def update_password_hash(db: Session, db_user: models.User, new_hash: str):
+    """Stores a rehashed password after the hashing scheme's settings changed."""
+    db_user.hashed_password = new_hash
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+# Loads everything schemas.Post serializes up front: the author is joined into the
+# post query and media/comments come from one IN query each, however many posts.
+POST_LOAD_OPTIONS = (
+    joinedload(models.Post.author),
+    selectinload(models.Post.primary_image_variants),
+    selectinload(models.Post.media).selectinload(models.Media.variants),
+    selectinload(models.Post.comments),
+)
+
+# Comments get their own version row, so public comment inserts never queue up
+# behind (or hold up) post and official writes on the posts row
+COMMENTS_VERSION = "comments"
 
-def get_posts(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Post).order_by(models.Post.created_at.desc()).offset(skip).limit(limit).all()
+# The content versions each cached namespace's responses are built from
+CONTENT_VERSION_SOURCES = {
+    cache.POSTS_NAMESPACE: (cache.POSTS_NAMESPACE, COMMENTS_VERSION),
+    cache.OFFICIALS_NAMESPACE: (cache.OFFICIALS_NAMESPACE,),
+}
+
+def content_version_bump(dialect_name: str, namespace: str):
+    """A single upsert that bumps a version, creating its row on first use without racing another writer."""
+    upsert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+    return (
+        upsert(models.ContentVersion)
+        .values(namespace=namespace, version=1, updated_at=func.now())
+        .on_conflict_do_update(
+            index_elements=[models.ContentVersion.namespace],
+            set_={"version": models.ContentVersion.version + 1, "updated_at": func.now()},
+        )
+    )
+
+def content_version_query(namespace: str):
+    # Every source only ever counts up, so their sum changes whenever any of them does
+    return select(
+        func.coalesce(func.sum(models.ContentVersion.version), 0).label("version"),
+        func.max(models.ContentVersion.updated_at).label("updated_at"),
+    ).where(models.ContentVersion.namespace.in_(CONTENT_VERSION_SOURCES.get(namespace, (namespace,))))
+
+def bump_content_version(db: Session, namespace: str):
+    """Bumps a content version as part of the caller's pending transaction."""
+    db.execute(content_version_bump(db.get_bind().dialect.name, namespace))
+
+def get_content_version(db: Session, namespace: str):
+    """Returns the (version, updated_at) of a namespace, used to build ETags without loading content."""
+    row = db.execute(content_version_query(namespace)).one()
+    return row.version, row.updated_at
+
+def get_posts(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None):
+    query = db.query(models.Post).options(*POST_LOAD_OPTIONS)
+    query = apply_keyset(query, models.Post.created_at, models.Post.id, cursor)
+    if cursor is None:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
 def get_post(db: Session, post_id: int):
-    return db.query(models.Post).filter(models.Post.id == post_id).first()
+    return db.query(models.Post).options(*POST_LOAD_OPTIONS).filter(models.Post.id == post_id).first()
+
+def _commit_keeping_loaded(db: Session):
+    """
+    Commits without expiring the session's objects, so that a write can return
+    what it just wrote without the response reading it all back.
+    """
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+def _fill_image_variants(db: Session, targets):
+    """
+    Sets the image variants of (object, relationship, source URL) targets from
+    a single query, which is skipped when none of them has an image.
+    """
+    urls = {url for _, _, url in targets if url}
+    variants_by_url = defaultdict(list)
+    if urls:
+        variants = db.scalars(
+            select(models.ImageVariant).where(models.ImageVariant.source_url.in_(urls)).order_by(models.ImageVariant.width)
+        )
+        for variant in variants:
+            variants_by_url[variant.source_url].append(variant)
+    for target, relationship, url in targets:
+        set_committed_value(target, relationship, list(variants_by_url.get(url, [])))
+
+def _media_variant_targets(db_post: models.Post):
+    return [(media_item, "variants", media_item.url) for media_item in db_post.media]
+
+# Summaries skip the comment rows entirely and only carry a count computed in SQL
+POST_SUMMARY_LOAD_OPTIONS = (
+    joinedload(models.Post.author),
+    selectinload(models.Post.primary_image_variants),
+    selectinload(models.Post.media).selectinload(models.Media.variants),
+)
+
+def _visible_comment_count():
+    return (
+        select(func.count(models.Comment.id))
+        .where(models.Comment.post_id == models.Post.id, models.Comment.is_inappropriate == False)
+        .correlate(models.Post)
+        .scalar_subquery()
+        .label("comment_count")
+    )
+
+def _with_comment_counts(rows):
+    posts = []
+    for post, comment_count in rows:
+        post.comment_count = comment_count
+        posts.append(post)
+    return posts
+
+# The public reads build their statements here so that the sync functions below
+# and api/async_crud.py run exactly the same SQL
+
+def post_summaries_statement(skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None):
+    stmt = select(models.Post, _visible_comment_count()).options(*POST_SUMMARY_LOAD_OPTIONS)
+    stmt = apply_keyset(stmt, models.Post.created_at, models.Post.id, cursor)
+    if cursor is None:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
+
+def post_detail_statement(post_id: int):
+    return (
+        select(models.Post, _visible_comment_count())
+        .options(*POST_SUMMARY_LOAD_OPTIONS)
+        .filter(models.Post.id == post_id)
+    )
+
+def comments_statement(post_id: Optional[int] = None, is_inappropriate: Optional[bool] = None, skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None):
+    stmt = select(models.Comment)
+    if post_id is not None:
+        stmt = stmt.filter(models.Comment.post_id == post_id)
+    if is_inappropriate is not None:
+        stmt = stmt.filter(models.Comment.is_inappropriate == is_inappropriate)
+    stmt = apply_keyset(stmt, models.Comment.created_at, models.Comment.id, cursor)
+    if cursor is None:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
+
+def post_exists_statement(post_id: int):
+    return select(models.Post.id).filter(models.Post.id == post_id)
+
+def officials_statement(skip: int = 0, limit: int = 100):
+    return select(models.Official).options(selectinload(models.Official.photo_variants)).offset(skip).limit(limit)
+
+def document_request_by_token_statement(request_token: str):
+    return select(models.DocumentRequest).filter(models.DocumentRequest.request_token == request_token)
+
+def get_post_summaries(db: Session, skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None):
+    """Retrieve a page of posts with authors, media and visible comment counts, but no comments."""
+    return _with_comment_counts(db.execute(post_summaries_statement(skip, limit, cursor)).all())
 
-def create_post(db: Session, post: schemas.PostCreate, user_id: int):
+def search_posts(db: Session, query: str, skip: int = 0, limit: int = 10):
+    """Finds posts matching a search query, best matches first, with highlighted titles and snippets."""
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_posts_fulltext(db, query, skip, limit)
+    return _search_posts_like(db, query, skip, limit)
+
+def _search_posts_fulltext(db: Session, query: str, skip: int, limit: int):
+    config = cast(search.SEARCH_TEXT_CONFIG, REGCONFIG)
+    ts_query = func.websearch_to_tsquery(config, query)
+    rank = func.ts_rank_cd(search.search_vector, ts_query).label("rank")
+    rows = (
+        db.query(
+            models.Post,
+            _visible_comment_count(),
+            rank,
+            func.ts_headline(config, models.Post.title, ts_query, search.TITLE_HEADLINE_OPTIONS),
+            func.ts_headline(config, func.coalesce(models.Post.content, ""), ts_query, search.SNIPPET_HEADLINE_OPTIONS),
+        )
+        .options(*POST_SUMMARY_LOAD_OPTIONS)
+        .filter(search.search_vector.op("@@")(ts_query))
+        .order_by(rank.desc(), models.Post.created_at.desc(), models.Post.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return _with_search_fields(
+        (post, comment_count, rank, search.headline_html(title), search.headline_html(snippet))
+        for post, comment_count, rank, title, snippet in rows
+    )
+
+def _search_posts_like(db: Session, query: str, skip: int, limit: int):
+    # Fallback for databases without full-text search: every term must appear
+    # in the title or content, and title matches rank higher
+    terms = search.query_terms(query)
+    if not terms:
+        return []
+    conditions, rank = [], 0
+    for term in terms:
+        pattern = f"%{_escape_like(term)}%"
+        in_title = models.Post.title.ilike(pattern, escape="\\")
+        in_content = models.Post.content.ilike(pattern, escape="\\")
+        conditions.append(or_(in_title, in_content))
+        rank = rank + case((in_title, 2), else_=0) + case((in_content, 1), else_=0)
+    rank = rank.label("rank")
+    rows = (
+        db.query(models.Post, _visible_comment_count(), rank)
+        .options(*POST_SUMMARY_LOAD_OPTIONS)
+        .filter(*conditions)
+        .order_by(rank.desc(), models.Post.created_at.desc(), models.Post.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return _with_search_fields(
+        (post, comment_count, rank, search.highlight(post.title, terms), search.snippet(post.content, terms))
+        for post, comment_count, rank in rows
+    )
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _with_search_fields(rows):
+    posts = []
+    for post, comment_count, rank, title_highlight, snippet in rows:
+        post.comment_count = comment_count
+        post.rank = float(rank)
+        post.title_highlight = title_highlight or search.highlight(post.title, [])
+        post.snippet = snippet
+        posts.append(post)
+    return posts
+
+def get_post_detail(db: Session, post_id: int, comment_skip: int = 0, comment_limit: int = 50):
+    """
+    Retrieve a single post with its visible comment count and one page of its
+    visible comments, so that paging through them ends at comment_count.
+    """
+    row = db.execute(post_detail_statement(post_id)).first()
+    if row is None:
+        return None, []
+    db_post = _with_comment_counts([row])[0]
+    comments = get_comments(db, post_id=post_id, is_inappropriate=False, skip=comment_skip, limit=comment_limit)
+    return db_post, comments
+
+def post_exists(db: Session, post_id: int) -> bool:
+    return db.execute(post_exists_statement(post_id)).first() is not None
+
+def create_post(db: Session, post: schemas.PostCreate, author: schemas.User):
+    # The author is the admin making the request, already loaded by authentication
+    db_author = models.User(**author.model_dump())
+    make_transient_to_detached(db_author)
     db_post = models.Post(
         title=post.title,
         content=post.content,
-        author_id=user_id,
-        primary_image_url=post.primary_image_url
+        author=db.merge(db_author, load=False),
+        primary_image_url=post.primary_image_url,
+        media=[models.Media(**media_item.model_dump()) for media_item in post.media],
+        comments=[],
     )
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
-    for media_item in post.media:
-        db_media = models.Media(**media_item.model_dump(), post_id=db_post.id)
-        db.add(db_media)
-    db.commit()
-    db.refresh(db_post)
+    adjust_media_refs(db, added=_post_media_urls(db_post))
+    # One flush inserts the post (RETURNING id and created_at) and then all of
+    # its media in a single batched INSERT; everything commits together.
+    db.flush()
+    bump_content_version(db, cache.POSTS_NAMESPACE)
+    _fill_image_variants(db, [(db_post, "primary_image_variants", db_post.primary_image_url)] + _media_variant_targets(db_post))
+    _commit_keeping_loaded(db)
+    cache.invalidate_posts()
     return db_post
 
 def update_post(db: Session, post_id: int, post_update: schemas.PostUpdate):
     db_post = get_post(db, post_id=post_id)
     if not db_post:
         return None
+    old_urls = _post_media_urls(db_post)
+    # Variants already loaded with the post stay valid; only new images need theirs
+    variant_targets = []
     if post_update.title is not None:
         db_post.title = post_update.title
     if post_update.content is not None:
         db_post.content = post_update.content
-    if post_update.primary_image_url is not None:
+    if post_update.primary_image_url is not None and post_update.primary_image_url != db_post.primary_image_url:
         db_post.primary_image_url = post_update.primary_image_url
+        variant_targets.append((db_post, "primary_image_variants", db_post.primary_image_url))
     if post_update.media is not None:
-        for media_item in db_post.media:
-            db.delete(media_item)
-        for new_media_item in post_update.media:
-            db_media = models.Media(url=new_media_item.url, media_type=new_media_item.media_type, post_id=db_post.id)
-            db.add(db_media)
-    db.commit()
-    db.refresh(db_post)
+        # Replace the media with one DELETE statement, then tell the ORM the old
+        # collection is gone so it doesn't also delete the rows one by one
+        db.execute(delete(models.Media).where(models.Media.post_id == db_post.id))
+        set_committed_value(db_post, "media", [])
+        db_post.media = [
+            models.Media(url=new_media_item.url, media_type=new_media_item.media_type)
+            for new_media_item in post_update.media
+        ]
+        variant_targets += _media_variant_targets(db_post)
+    adjust_media_refs(db, added=_post_media_urls(db_post), removed=old_urls)
+    bump_content_version(db, cache.POSTS_NAMESPACE)
+    _fill_image_variants(db, variant_targets)
+    _commit_keeping_loaded(db)
+    cache.invalidate_posts()
     return db_post
 
 def delete_post(db: Session, post_id: int):
     db_post = get_post(db, post_id=post_id)
     if db_post:
+        adjust_media_refs(db, removed=_post_media_urls(db_post))
         db.delete(db_post)
+        bump_content_version(db, cache.POSTS_NAMESPACE)
         db.commit()
+        cache.invalidate_posts()
     return db_post
 
 def get_comment(db: Session, comment_id: int):
     return db.query(models.Comment).filter(models.Comment.id == comment_id).first()
 
-def get_comments(db: Session, post_id: Optional[int] = None, is_inappropriate: Optional[bool] = None, skip: int = 0, limit: int = 100):
-    query = db.query(models.Comment)
-    if post_id is not None:
-        query = query.filter(models.Comment.post_id == post_id)
-    if is_inappropriate is not None:
-        query = query.filter(models.Comment.is_inappropriate == is_inappropriate)
-    return query.order_by(models.Comment.created_at.desc()).offset(skip).limit(limit).all()
+def get_comments(db: Session, post_id: Optional[int] = None, is_inappropriate: Optional[bool] = None, skip: int = 0, limit: int = 100, cursor: Optional[Cursor] = None):
+    return db.scalars(comments_statement(post_id, is_inappropriate, skip, limit, cursor)).all()
 
-def create_comment(db: Session, comment: schemas.CommentCreate, post_id: int):
+def new_comment(comment: schemas.CommentCreate, post_id: int) -> models.Comment:
+    """Builds a comment on a post, flagged if it contains inappropriate words."""
     is_inap = check_for_inappropriate_words(comment.content)
-    db_comment = models.Comment(**comment.model_dump(), post_id=post_id, is_inappropriate=is_inap)
+    return models.Comment(**comment.model_dump(), post_id=post_id, is_inappropriate=is_inap)
+
+def create_comment(db: Session, comment: schemas.CommentCreate, post_id: int):
+    db_comment = new_comment(comment, post_id)
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    bump_content_version(db, COMMENTS_VERSION)
+    db.flush()  # Assigns the id and created_at the live comment streams send
+    events.notify_comment_change(db, events.COMMENT_CREATED, db_comment)
+    _commit_keeping_loaded(db)
+    cache.invalidate_posts()
     return db_comment
 
 def delete_comment(db: Session, comment_id: int):
     db_comment = get_comment(db, comment_id=comment_id)
     if db_comment:
         db.delete(db_comment)
+        bump_content_version(db, COMMENTS_VERSION)
+        events.notify_comment_change(db, events.COMMENT_DELETED, db_comment)
         db.commit()
+        cache.invalidate_posts()
     return db_comment
 
 def mark_comment_inappropriate(db: Session, comment_id: int, flag: bool):
     db_comment = get_comment(db, comment_id=comment_id)
     if db_comment:
+        changed = db_comment.is_inappropriate != flag
         db_comment.is_inappropriate = flag
+        if changed:
+            events.notify_comment_change(db, events.COMMENT_FLAGGED if flag else events.COMMENT_UNFLAGGED, db_comment)
+        bump_content_version(db, COMMENTS_VERSION)
         db.commit()
+        cache.invalidate_posts()
         db.refresh(db_comment)
     return db_comment
 
-def get_document_requests(db: Session, status: Optional[str] = None, document_type: Optional[str] = None):
+def rescan_comments(
+    db: Session,
+    post_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    unflag_clean: bool = False,
+    batch_size: int = 1000,
+) -> dict:
+    """
+    Re-runs the profanity filter over existing comments and updates the flags
+    that changed, with one set-based UPDATE per batch_size changed comments.
+    Everything commits together at the end. Manually flagged comments are
+    only unflagged when unflag_clean is set.
+    """
+    query = db.query(models.Comment.id, models.Comment.content, models.Comment.is_inappropriate)
+    if post_id is not None:
+        query = query.filter(models.Comment.post_id == post_id)
+    if start_date is not None:
+        query = query.filter(models.Comment.created_at >= start_date)
+    if end_date is not None:
+        query = query.filter(models.Comment.created_at < end_date)
+
+    scanned = flagged = unflagged = 0
+    to_flag: List[int] = []
+    to_unflag: List[int] = []
+    for comment_id, content, is_inappropriate in query.yield_per(batch_size):
+        scanned += 1
+        is_inap = check_for_inappropriate_words(content)
+        if is_inap and not is_inappropriate:
+            to_flag.append(comment_id)
+        elif unflag_clean and not is_inap and is_inappropriate:
+            to_unflag.append(comment_id)
+        if len(to_flag) + len(to_unflag) >= batch_size:
+            _set_comment_flags(db, to_flag, to_unflag)
+            flagged, unflagged = flagged + len(to_flag), unflagged + len(to_unflag)
+            to_flag, to_unflag = [], []
+    if to_flag or to_unflag:
+        _set_comment_flags(db, to_flag, to_unflag)
+        flagged, unflagged = flagged + len(to_flag), unflagged + len(to_unflag)
+
+    if flagged or unflagged:
+        bump_content_version(db, COMMENTS_VERSION)
+        db.commit()
+        cache.invalidate_posts()
+
+    return {"scanned": scanned, "flagged": flagged, "unflagged": unflagged}
+
+def _set_comment_flags(db: Session, to_flag: List[int], to_unflag: List[int]):
+    db.execute(
+        update(models.Comment)
+        .where(models.Comment.id.in_(to_flag + to_unflag))
+        .values(is_inappropriate=case((models.Comment.id.in_(to_flag), True), else_=False))
+        .execution_options(synchronize_session=False)
+    )
+
+def _filter_document_requests(query, document_type: Optional[str] = None, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None):
+    if document_type:
+        query = query.filter(models.DocumentRequest.document_type == document_type)
+    if start_date is not None:
+        query = query.filter(models.DocumentRequest.created_at >= start_date)
+    if end_date is not None:
+        query = query.filter(models.DocumentRequest.created_at < end_date)
+    return query
+
+def get_document_requests(
+    db: Session,
+    status: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[Cursor] = None,
+):
     query = db.query(models.DocumentRequest)
     if status:
         query = query.filter(models.DocumentRequest.status == status)
-    if document_type:
-        query = query.filter(models.DocumentRequest.document_type == document_type)
-    return query.order_by(models.DocumentRequest.created_at.desc()).all()
+    query = _filter_document_requests(query, document_type=document_type, start_date=start_date, end_date=end_date)
+    query = apply_keyset(query, models.DocumentRequest.created_at, models.DocumentRequest.id, cursor)
+    if cursor is None:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def search_document_requests(
+    db: Session,
+    query: str,
+    status: Optional[str] = None,
+    document_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 20,
+    min_similarity: float = DOCUMENT_SEARCH_MIN_SIMILARITY,
+):
+    """Finds document requests whose requester name or address resembles the query, closest first."""
+    if db.get_bind().dialect.name == "postgresql":
+        rows = _search_document_requests_trigram(db, query, status, document_type, skip, limit, min_similarity)
+    else:
+        rows = _search_document_requests_like(db, query, status, document_type, skip, limit)
+    results = []
+    for db_request, similarity in rows:
+        db_request.similarity = float(similarity)
+        results.append(db_request)
+    return results
+
+def _search_document_requests_trigram(db: Session, query: str, status, document_type, skip: int, limit: int, min_similarity: float):
+    name, address = models.DocumentRequest.requester_name, models.DocumentRequest.address
+    # The <% operator (word similarity above the threshold) and ILIKE can both
+    # use the trigram GIN indexes; the threshold only applies to this transaction
+    db.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(min_similarity), True)))
+    substring = f"%{_escape_like(query)}%"
+    similarity = func.greatest(func.word_similarity(query, name), func.word_similarity(query, address)).label("similarity")
+    db_query = db.query(models.DocumentRequest, similarity).filter(
+        or_(
+            literal(query).op("<%")(name),
+            literal(query).op("<%")(address),
+            name.ilike(substring, escape="\\"),
+            address.ilike(substring, escape="\\"),
+        )
+    )
+    if status:
+        db_query = db_query.filter(models.DocumentRequest.status == status)
+    db_query = _filter_document_requests(db_query, document_type=document_type)
+    return (
+        db_query.order_by(similarity.desc(), models.DocumentRequest.created_at.desc(), models.DocumentRequest.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+def _search_document_requests_like(db: Session, query: str, status, document_type, skip: int, limit: int):
+    # Fallback without pg_trgm (SQLite in tests): substring matches only,
+    # with the similarity computed in Python for the returned page
+    terms = search.query_terms(query)
+    if not terms:
+        return []
+    db_query = db.query(models.DocumentRequest)
+    for term in terms:
+        substring = f"%{_escape_like(term)}%"
+        db_query = db_query.filter(
+            or_(
+                models.DocumentRequest.requester_name.ilike(substring, escape="\\"),
+                models.DocumentRequest.address.ilike(substring, escape="\\"),
+            )
+        )
+    if status:
+        db_query = db_query.filter(models.DocumentRequest.status == status)
+    db_query = _filter_document_requests(db_query, document_type=document_type)
+    db_requests = (
+        db_query.order_by(models.DocumentRequest.created_at.desc(), models.DocumentRequest.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    return [
+        (db_request, max(search.similarity(query, db_request.requester_name), search.similarity(query, db_request.address)))
+        for db_request in db_requests
+    ]
+
+def get_document_request_summary(
+    db: Session,
+    document_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> dict:
+    """Counts document requests per status in a single aggregate query."""
+    query = db.query(models.DocumentRequest.status, func.count(models.DocumentRequest.id))
+    query = _filter_document_requests(query, document_type=document_type, start_date=start_date, end_date=end_date)
+    by_status = {request_status.value: 0 for request_status in schemas.RequestStatus}
+    for request_status, count in query.group_by(models.DocumentRequest.status).all():
+        by_status[request_status] = count
+    return {"total": sum(by_status.values()), "by_status": by_status}
 
 def get_document_request_by_id(db: Session, request_id: int):
     return db.query(models.DocumentRequest).filter(models.DocumentRequest.id == request_id).first()
 
-def create_activity_log(db: Session, user: schemas.User, action: str, details: str = None):
-    db_log = models.ActivityLog(user_id=user.id, action=action, details=details)
-    db.add(db_log)
+def get_document_request_by_token(db: Session, request_token: str):
+    return db.scalars(document_request_by_token_statement(request_token)).first()
+
+def update_request_status(db: Session, db_request: models.DocumentRequest, status_update: schemas.DocumentStatusUpdate):
+    """Sets a request's status and message, notifying anyone streaming its status."""
+    db_request.status = status_update.status
+    db_request.admin_message = status_update.admin_message
+    events.notify_status_change(db, db_request)
     db.commit()
-    db.refresh(db_log)
-    return db_log
+    db.refresh(db_request)
+    return db_request
 
-def get_activity_logs(db: Session, skip: int = 0, limit: int = 100, sort_by: str = "timestamp", sort_order: str = "desc"):
+def bulk_create_activity_logs(db: Session, entries: List[dict]):
+    """Inserts many activity log entries with a single batched INSERT and one commit."""
+    if not entries:
+        return
+    db.execute(insert(models.ActivityLog), entries)
+    db.commit()
+
+def get_activity_logs(db: Session, skip: int = 0, limit: int = 100, sort_by: str = "timestamp", sort_order: str = "desc", cursor: Optional[Cursor] = None):
     query = db.query(models.ActivityLog).join(models.User) # Join to access user details for sorting by user.display_name
     
     # Sorting logic
-    if sort_by == "timestamp":
-        if sort_order == "desc":
-            query = query.order_by(models.ActivityLog.timestamp.desc())
-        else:
-            query = query.order_by(models.ActivityLog.timestamp.asc())
-    elif sort_by == "user":
+    if sort_by == "user":
         if sort_order == "desc":
             query = query.order_by(models.User.display_name.desc())
         else:
@@ -185,8 +626,12 @@ def get_activity_logs(db: Session, skip: int = 0, limit: int = 100, sort_by: str
             query = query.order_by(models.ActivityLog.action.desc())
         else:
             query = query.order_by(models.ActivityLog.action.asc())
-    else: # Default sort
-        query = query.order_by(models.ActivityLog.timestamp.desc())
+    else: # Default sort by timestamp, which also supports keyset pagination
+        query = apply_keyset(
+            query, models.ActivityLog.timestamp, models.ActivityLog.id, cursor, descending=sort_order != "asc"
+        )
+        if cursor is not None:
+            return query.limit(limit).all()
 
     return query.offset(skip).limit(limit).all()
 
@@ -196,13 +641,16 @@ def get_official(db: Session, official_id: int):
 
 def get_officials(db: Session, skip: int = 0, limit: int = 100):
     """Retrieve a list of all officials."""
-    return db.query(models.Official).offset(skip).limit(limit).all()
+    return db.scalars(officials_statement(skip, limit)).all()
 
 def create_official(db: Session, official: schemas.OfficialCreate):
     """Create a new official record."""
     db_official = models.Official(**official.dict())
     db.add(db_official)
+    adjust_media_refs(db, added=[db_official.photo_url])
+    bump_content_version(db, cache.OFFICIALS_NAMESPACE)
     db.commit()
+    cache.invalidate_officials()
     db.refresh(db_official)
     return db_official
 
@@ -210,10 +658,14 @@ def update_official(db: Session, official_id: int, official_update: schemas.Offi
     """Update an existing official's details."""
     db_official = get_official(db, official_id)
     if db_official:
+        old_photo_url = db_official.photo_url
         update_data = official_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_official, key, value)
+        adjust_media_refs(db, added=[db_official.photo_url], removed=[old_photo_url])
+        bump_content_version(db, cache.OFFICIALS_NAMESPACE)
         db.commit()
+        cache.invalidate_officials()
         db.refresh(db_official)
     return db_official
 
@@ -221,6 +673,102 @@ def delete_official(db: Session, official_id: int):
     """Delete an official record."""
     db_official = get_official(db, official_id)
     if db_official:
+        adjust_media_refs(db, removed=[db_official.photo_url])
         db.delete(db_official)
+        bump_content_version(db, cache.OFFICIALS_NAMESPACE)
+        db.commit()
+        cache.invalidate_officials()
+    return db_official
+
+# --- Media Blob CRUD ---
+
+def claim_media_blob(db: Session, sha256: str):
+    """
+    Looks up a stored file by content hash and marks it as used now, in one
+    UPDATE. collect_orphan_media skips the row while this holds its lock, and
+    afterwards finds it inside the grace period, so the file stays until the
+    post or official using it is saved. Returns the (path, url) row, or None
+    if there is no such file (including one the collector just removed).
+    """
+    row = db.execute(
+        update(models.MediaBlob)
+        .where(models.MediaBlob.sha256 == sha256)
+        .values(last_used_at=func.now())
+        .returning(models.MediaBlob.path, models.MediaBlob.url)
+        .execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return row
+
+def create_media_blob(db: Session, sha256: str, path: str, url: str, content_type: Optional[str], size: int):
+    db_blob = models.MediaBlob(sha256=sha256, path=path, url=url, content_type=content_type, size=size, ref_count=0)
+    db.add(db_blob)
+    try:
         db.commit()
-    return db_official
\ No newline at end of file
+    except IntegrityError:
+        # The same content finished uploading concurrently; both wrote identical bytes
+        db.rollback()
+        db_blob = db.get(models.MediaBlob, sha256)
+    return db_blob
+
+def adjust_media_refs(db: Session, added: Iterable[Optional[str]] = (), removed: Iterable[Optional[str]] = ()):
+    """
+    Updates the reference counts of stored files as part of the caller's
+    transaction, in one UPDATE. URLs that aren't stored blobs (external links,
+    files uploaded before deduplication) are ignored. A removed reference also
+    counts as a use, so a file dropped from its last post stays for the grace
+    period in case the change is undone.
+    """
+    deltas = Counter(url for url in added if url)
+    deltas.subtract(url for url in removed if url)
+    deltas = {url: delta for url, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    db.execute(
+        update(models.MediaBlob)
+        .where(models.MediaBlob.url.in_(list(deltas)))
+        .values(
+            ref_count=models.MediaBlob.ref_count + case(deltas, value=models.MediaBlob.url, else_=0),
+            last_used_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def _post_media_urls(db_post: models.Post) -> List[Optional[str]]:
+    return [db_post.primary_image_url] + [media_item.url for media_item in db_post.media]
+
+def collect_orphan_media(db: Session, grace_seconds: float = MEDIA_BLOB_GC_GRACE_SECONDS) -> List[str]:
+    """
+    Deletes the records of stored files nothing references any more, and of
+    their image variants, and returns the URLs to remove from storage. Files
+    used within the grace period are kept, since a fresh upload is only
+    referenced once the post or official using it is saved.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    orphans = (
+        db.query(models.MediaBlob.sha256, models.MediaBlob.url)
+        .filter(models.MediaBlob.ref_count <= 0, models.MediaBlob.last_used_at < cutoff)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not orphans:
+        db.rollback()
+        return []
+    source_urls = [orphan.url for orphan in orphans]
+    variant_urls = db.scalars(
+        select(models.ImageVariant.url).where(models.ImageVariant.source_url.in_(source_urls))
+    ).all()
+    db.execute(delete(models.ImageVariant).where(models.ImageVariant.source_url.in_(source_urls)))
+    db.execute(delete(models.MediaBlob).where(models.MediaBlob.sha256.in_([orphan.sha256 for orphan in orphans])))
+    db.commit()
+    return source_urls + list(variant_urls)
+
+def get_image_variants(db: Session, source_url: str) -> List[models.ImageVariant]:
+    return db.query(models.ImageVariant).filter(models.ImageVariant.source_url == source_url).order_by(models.ImageVariant.width).all()
+
+def create_image_variants(db: Session, source_url: str, variants: List[dict]):
+    """Records the resized copies generated for an uploaded image."""
+    if not variants:
+        return
+    db.execute(insert(models.ImageVariant), [{**variant, "source_url": source_url} for variant in variants])
+    db.commit()
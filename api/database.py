@@ -1,15 +1,134 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 import os
 
+from .pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, PoolMetrics, instrument
+from .settings import (
+    DB_ASYNC,
+    DB_MAX_OVERFLOW,
+    DB_POOL_MODE,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_WARMUP,
+)
+
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+
+def pool_options(async_engine: bool = False) -> dict:
+    """Engine keyword arguments for the pool configured in settings."""
+    if DB_POOL_MODE == "null":
+        return {"poolclass": NullPool, "pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_POOL_MODE != "queue":
+        raise RuntimeError(f"Unknown DB_POOL_MODE '{DB_POOL_MODE}'. Use 'queue' or 'null'.")
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if async_engine else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,  # Helps with stale connections, at one round trip per checkout
+    }
+
+
+if DATABASE_URL and DATABASE_URL.startswith("sqlite"):
+    # Local development and the tests; sessions are used from threadpool threads
+    connect_args = {"check_same_thread": False}
+else:
+    connect_args = {"sslmode": "require"}  # Ensure SSL
+
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,  # Helps with stale connections
-    connect_args={"sslmode": "require"}  # Ensure SSL
+    connect_args=connect_args,
+    **pool_options(),
 )
+pool_metrics = instrument(engine, PoolMetrics())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+
+def to_async_url(url: str) -> str:
+    """Rewrites a postgres:// or postgresql:// URL to use the asyncpg driver, and a sqlite:// one to use aiosqlite."""
+    scheme, rest = url.split("://", 1)
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        scheme = "postgresql+asyncpg"
+    elif scheme == "sqlite":
+        scheme = "sqlite+aiosqlite"
+    return f"{scheme}://{rest}"
+
+
+def create_async_engine_for(url: str):
+    """Builds the async engine for a database URL, with the pool configured in settings."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_url = to_async_url(url)
+    if async_url.startswith("sqlite"):
+        async_connect_args = {}  # Local development and the tests
+    else:
+        async_connect_args = {"ssl": "require"}  # asyncpg takes "ssl" instead of "sslmode"
+        if DB_POOL_MODE == "null":
+            # Transaction poolers hand each statement to any backend, so server-side
+            # prepared statements cannot be cached
+            async_connect_args.update({"statement_cache_size": 0, "prepared_statement_cache_size": 0})
+    return create_async_engine(async_url, connect_args=async_connect_args, **pool_options(async_engine=True))
+
+
+def async_session_factory(bind):
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    # Objects stay usable after commit; async sessions cannot lazy-load expired attributes
+    return async_sessionmaker(bind, class_=AsyncSession, expire_on_commit=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+async_pool_metrics = None
+
+if DB_ASYNC:
+    async_engine = create_async_engine_for(DATABASE_URL)
+    async_pool_metrics = instrument(async_engine, PoolMetrics())
+    AsyncSessionLocal = async_session_factory(async_engine)
+
+
+def check_connection():
+    """Runs a trivial query, raising if the database cannot be reached."""
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def warm_up_pool(count: int = DB_POOL_WARMUP) -> int:
+    """Opens pooled connections ahead of the first requests and returns how many were opened."""
+    if DB_POOL_MODE == "null":
+        return 0  # Nothing is kept between checkouts
+    connections = []
+    try:
+        for _ in range(min(count, DB_POOL_SIZE)):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        # Closing returns them to the pool, which keeps them open
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def warm_up_async_pool(count: int = DB_POOL_WARMUP) -> int:
+    """Async engine version of warm_up_pool."""
+    if async_engine is None or DB_POOL_MODE == "null":
+        return 0
+    connections = []
+    try:
+        for _ in range(min(count, DB_POOL_SIZE)):
+            connection = await async_engine.connect()
+            connections.append(connection)
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
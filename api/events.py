@@ -0,0 +1,482 @@
+import asyncio
+import json
+import select
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Set
+
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import schemas
+from .settings import (
+    EVENTS_BACKEND,
+    SSE_HEARTBEAT_SECONDS,
+    SSE_MAX_SUBSCRIBERS,
+    WS_COMMENT_QUEUE_SIZE,
+    WS_MAX_CONNECTIONS,
+)
+
+STATUS_CHANNEL = "document_request_status"
+COMMENT_CHANNEL = "post_comments"
+# NOTIFY payloads must stay under 8000 bytes
+MAX_NOTIFY_PAYLOAD = 7500
+
+
+class TooManySubscribers(Exception):
+    """Raised when this worker already holds as many open streams as it allows."""
+
+
+class StatusBroker:
+    """
+    Hands document request status changes to the SSE streams waiting on them.
+
+    Each stream owns a small asyncio queue on the event loop; publish() may be
+    called from any thread. A slow stream only ever misses intermediate
+    changes: when its queue is full the oldest change is dropped, since the
+    newest status is the one that matters.
+    """
+
+    def __init__(self, max_subscribers: int = 1000, queue_size: int = 8):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, request_token: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if self._count >= self.max_subscribers:
+                raise TooManySubscribers()
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.setdefault(request_token, set()).add(queue)
+            self._count += 1
+        if EVENTS_BACKEND == "postgres":
+            _ensure_listener()
+        return queue
+
+    def unsubscribe(self, request_token: str, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(request_token)
+            if queues is None or queue not in queues:
+                return
+            queues.discard(queue)
+            self._count -= 1
+            if not queues:
+                del self._subscribers[request_token]
+
+    def publish(self, payload: dict):
+        """Delivers a status change to this worker's streams for its request token."""
+        with self._lock:
+            self.published += 1
+            queues = list(self._subscribers.get(payload["request_token"], ()))
+            loop = self._loop
+        if queues and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, queues, payload)
+
+    def _deliver(self, queues, payload: dict):
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+                self.dropped += 1
+            queue.put_nowait(payload)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": EVENTS_BACKEND,
+                "subscribers": self._count,
+                "request_tokens": len(self._subscribers),
+                "published": self.published,
+                "dropped": self.dropped,
+            }
+
+
+broker = StatusBroker(max_subscribers=SSE_MAX_SUBSCRIBERS)
+
+
+class CommentConnection:
+    """One WebSocket receiving comment events, with its own bounded send queue."""
+
+    def __init__(self, websocket: WebSocket, post_id: Optional[int], moderator: bool, queue_size: int):
+        self.websocket = websocket
+        self.post_id = post_id
+        self.moderator = moderator
+        # Holds encoded messages; None tells the sender to close the connection
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+
+class CommentHub:
+    """
+    Pushes comment events to the WebSocket viewers of a post and to the
+    admin moderation screen.
+
+    Each event is encoded once and put on the send queue of every interested
+    connection; a task per connection drains its queue, so a slow client
+    never holds up the others. Comments are events a client cannot skip, so
+    when a queue fills up the client has fallen too far behind: it is
+    disconnected with close code 1013 and reloads the comments instead.
+    publish() may be called from any thread.
+    """
+
+    def __init__(self, max_connections: int = 1000, queue_size: int = 32):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.published = 0
+        self.sent = 0
+        self.slow_disconnects = 0
+        # Keyed by post id; moderators watching every post are kept under None
+        self._viewers: Dict[int, Set[CommentConnection]] = {}
+        self._moderators: Dict[Optional[int], Set[CommentConnection]] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def connect(self, websocket: WebSocket, post_id: Optional[int] = None, moderator: bool = False) -> CommentConnection:
+        connection = CommentConnection(websocket, post_id, moderator, self.queue_size)
+        with self._lock:
+            if self._count >= self.max_connections:
+                raise TooManySubscribers()
+            self._loop = asyncio.get_running_loop()
+            connections = self._moderators if moderator else self._viewers
+            connections.setdefault(post_id, set()).add(connection)
+            self._count += 1
+        if EVENTS_BACKEND == "postgres":
+            _ensure_listener()
+        return connection
+
+    def disconnect(self, connection: CommentConnection):
+        with self._lock:
+            connections = self._moderators if connection.moderator else self._viewers
+            group = connections.get(connection.post_id)
+            if group is None or connection not in group:
+                return
+            group.discard(connection)
+            self._count -= 1
+            if not group:
+                del connections[connection.post_id]
+
+    def publish(self, payload: dict):
+        """Delivers a comment event to this worker's viewers of its post and to moderators."""
+        post_id = payload["post_id"]
+        with self._lock:
+            self.published += 1
+            viewers = list(self._viewers.get(post_id, ()))
+            moderators = list(self._moderators.get(None, ())) + list(self._moderators.get(post_id, ()))
+            loop = self._loop
+        if (viewers or moderators) and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._deliver, viewers, moderators, payload)
+
+    def _deliver(self, viewers, moderators, payload: dict):
+        if moderators:
+            message = json.dumps(payload)
+            for connection in moderators:
+                self._enqueue(connection, message)
+        viewer_payload = viewer_event(payload)
+        if viewers and viewer_payload is not None:
+            message = json.dumps(viewer_payload)
+            for connection in viewers:
+                self._enqueue(connection, message)
+
+    def _enqueue(self, connection: CommentConnection, message: str):
+        if connection.overflowed:
+            return
+        try:
+            connection.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            connection.overflowed = True
+            self.slow_disconnects += 1
+            # Nothing queued is worth sending any more; make room for the close
+            while not connection.queue.empty():
+                connection.queue.get_nowait()
+            connection.queue.put_nowait(None)
+
+    async def serve(self, websocket: WebSocket, post_id: Optional[int] = None, moderator: bool = False):
+        """Accepts a WebSocket and pushes comment events to it until either side closes."""
+        try:
+            connection = self.connect(websocket, post_id=post_id, moderator=moderator)
+        except TooManySubscribers:
+            await websocket.close(code=1013, reason="Too many open comment streams, try again later.")
+            return
+        tasks = []
+        try:
+            await websocket.accept()
+            tasks = [asyncio.create_task(self._send(connection)), asyncio.create_task(self._receive(websocket))]
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.disconnect(connection)
+
+    async def _send(self, connection: CommentConnection):
+        try:
+            while True:
+                message = await connection.queue.get()
+                if message is None:
+                    await connection.websocket.close(code=1013, reason="Fell behind, reload the comments.")
+                    return
+                # Waits while the client's socket buffer is full, which is what fills the queue
+                await connection.websocket.send_text(message)
+                self.sent += 1
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # The client is already gone
+
+    async def _receive(self, websocket: WebSocket):
+        # Clients have nothing to say; reading is how a disconnect is noticed
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": EVENTS_BACKEND,
+                "connections": self._count,
+                "posts": len(self._viewers),
+                "moderators": sum(len(group) for group in self._moderators.values()),
+                "published": self.published,
+                "sent": self.sent,
+                "slow_disconnects": self.slow_disconnects,
+            }
+
+
+comment_hub = CommentHub(max_connections=WS_MAX_CONNECTIONS, queue_size=WS_COMMENT_QUEUE_SIZE)
+
+
+class PostgresEventListener:
+    """
+    LISTENs for events NOTIFYed by any worker and hands them to the local
+    broker of their channel. Holds one dedicated connection outside the pool;
+    it needs a session-level connection, not a transaction-mode pooler.
+    """
+
+    def __init__(self, engine, handlers: Dict[str, Callable[[dict], None]]):
+        self.engine = engine
+        self.handlers = handlers
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="event-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            connection = None
+            try:
+                # Detached, so the pool opens a replacement instead of lending this one out
+                connection = self.engine.raw_connection()
+                connection.detach()
+                dbapi_connection = connection.dbapi_connection
+                dbapi_connection.autocommit = True
+                cursor = dbapi_connection.cursor()
+                for channel in self.handlers:
+                    cursor.execute(f"LISTEN {channel}")
+                while not self._stopped.is_set():
+                    if select.select([dbapi_connection], [], [], 5) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        notification = dbapi_connection.notifies.pop(0)
+                        self.handlers[notification.channel](json.loads(notification.payload))
+            except Exception as e:
+                print(f"Event listener error: {e}")
+                time.sleep(1)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+
+_listener: Optional[PostgresEventListener] = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    # Started on the first subscription, so workers nobody streams from never LISTEN
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            from .database import engine
+
+            _listener = PostgresEventListener(
+                engine, {STATUS_CHANNEL: broker.publish, COMMENT_CHANNEL: _publish_notified_comment}
+            )
+            _listener.start()
+
+
+def shutdown():
+    if _listener is not None:
+        _listener.stop()
+
+
+PENDING_EVENTS_KEY = "pending_events"
+
+
+def _notify_on_commit(db, channel: str, payload: dict, publish: Callable[[dict], None], message: Optional[str] = None):
+    """
+    Publishes an event once the caller's transaction commits, and never if it
+    rolls back. With EVENTS_BACKEND=postgres this is a NOTIFY in that same
+    transaction, which Postgres only delivers on commit, to every worker.
+    """
+    # Async sessions hold their state on the sync session they wrap
+    session = getattr(db, "sync_session", db)
+    session.info.setdefault(PENDING_EVENTS_KEY, []).append((channel, payload, publish, message or json.dumps(payload)))
+
+
+@event.listens_for(Session, "before_commit")
+def _send_pending_notifications(session: Session):
+    if EVENTS_BACKEND != "postgres":
+        return
+    for channel, _, _, message in session.info.pop(PENDING_EVENTS_KEY, ()):
+        session.execute(sql_select(func.pg_notify(channel, message)))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(session: Session):
+    if session.in_nested_transaction():
+        return  # A savepoint was released; the events wait for the real commit
+    for _, payload, publish, _ in session.info.pop(PENDING_EVENTS_KEY, ()):
+        publish(payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session: Session):
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+def status_payload(db_request, changed_at: Optional[datetime] = None) -> dict:
+    changed_at = changed_at or datetime.now(timezone.utc)
+    return {
+        "request_token": db_request.request_token,
+        "status": getattr(db_request.status, "value", db_request.status),
+        "admin_message": db_request.admin_message,
+        "changed_at": changed_at.isoformat(),
+    }
+
+
+def notify_status_change(db: Session, db_request):
+    """Announces a status change to its SSE streams once the caller's transaction commits."""
+    payload = status_payload(db_request)
+    message = json.dumps(payload)
+    if len(message.encode("utf-8")) > MAX_NOTIFY_PAYLOAD:
+        # Streams reload the row when the message had to be left out
+        message = json.dumps({key: value for key, value in payload.items() if key != "admin_message"})
+    _notify_on_commit(db, STATUS_CHANNEL, payload, broker.publish, message)
+
+
+def current_status(request_token: str) -> Optional[dict]:
+    """Reads a request's current status with a short-lived session (streams stay open for long)."""
+    # Imported here to avoid a circular import with crud
+    from . import crud
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        db_request = crud.get_document_request_by_token(db, request_token)
+        if db_request is None:
+            return None
+        return status_payload(db_request, changed_at=db_request.updated_at or db_request.created_at)
+    finally:
+        db.close()
+
+
+def _format_event(payload: dict, event_id: int) -> str:
+    return f"event: status\nid: {event_id}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def status_stream(request: Request, request_token: str, queue: asyncio.Queue, current: dict):
+    """Yields the current status, then every change, as Server-Sent Events until the client leaves."""
+    event_id = 0
+    try:
+        yield f"retry: 5000\n{_format_event(current, event_id)}"
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Comments keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if "admin_message" not in payload:
+                payload = await run_in_threadpool(current_status, request_token) or payload
+            event_id += 1
+            yield _format_event(payload, event_id)
+    finally:
+        broker.unsubscribe(request_token, queue)
+
+
+COMMENT_CREATED = "comment.created"
+COMMENT_FLAGGED = "comment.flagged"
+COMMENT_UNFLAGGED = "comment.unflagged"
+COMMENT_DELETED = "comment.deleted"
+
+
+def comment_payload(event_type: str, db_comment) -> dict:
+    payload = {"type": event_type, "post_id": db_comment.post_id, "comment_id": db_comment.id}
+    if event_type != COMMENT_DELETED:
+        payload["comment"] = schemas.Comment.model_validate(db_comment).model_dump(mode="json")
+    return payload
+
+
+def viewer_event(payload: dict) -> Optional[dict]:
+    """
+    What a public viewer may see of a moderation-level comment event: new or
+    unflagged visible comments are added, flagged or deleted ones removed,
+    and flagged comments themselves are never sent.
+    """
+    event_type = payload["type"]
+    if event_type in (COMMENT_FLAGGED, COMMENT_DELETED):
+        return {"type": "comment.removed", "post_id": payload["post_id"], "comment_id": payload["comment_id"]}
+    if event_type == COMMENT_CREATED and payload["comment"]["is_inappropriate"]:
+        return None
+    return {"type": "comment.added", "post_id": payload["post_id"], "comment": payload["comment"]}
+
+
+def notify_comment_change(db, event_type: str, db_comment):
+    """
+    Announces a new, flagged, unflagged or deleted comment to its WebSocket
+    streams once the caller's transaction commits. Works with sync and async
+    sessions; the comment must already have its id and created_at.
+    """
+    payload = comment_payload(event_type, db_comment)
+    message = json.dumps(payload)
+    if len(message.encode("utf-8")) > MAX_NOTIFY_PAYLOAD:
+        # The receiving workers load the comment themselves
+        message = json.dumps({key: value for key, value in payload.items() if key != "comment"})
+    _notify_on_commit(db, COMMENT_CHANNEL, payload, comment_hub.publish, message)
+
+
+def _publish_notified_comment(payload: dict):
+    if payload["type"] != COMMENT_DELETED and "comment" not in payload:
+        # Imported here to avoid a circular import with crud
+        from . import crud
+        from .database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            db_comment = crud.get_comment(db, comment_id=payload["comment_id"])
+            if db_comment is None:
+                return  # Deleted since; its own event follows
+            payload = comment_payload(payload["type"], db_comment)
+        finally:
+            db.close()
+    comment_hub.publish(payload)
@@ -0,0 +1,88 @@
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from . import storage
+from .settings import IMAGE_PROCESS_WORKERS, IMAGE_VARIANT_WIDTHS, IMAGE_WEBP_QUALITY
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is only needed to generate image variants
+    Image = None
+
+# Formats Pillow can resize without losing anything the original relies on
+# (GIF animation, SVG vectors and videos are stored as uploaded)
+PROCESSABLE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _render_variants(data: bytes, widths: Dict[str, int], quality: int) -> List[Tuple[str, int, int, bytes]]:
+    # Runs in a worker process: decoding and resizing are CPU bound and would
+    # otherwise hold the GIL for the whole request
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+        rendered = []
+        seen_widths = set()
+        for name, width in sorted(widths.items(), key=lambda item: item[1]):
+            width = min(width, image.width)  # Never upscale
+            if width in seen_widths:
+                continue
+            seen_widths.add(width)
+            variant = image.copy()
+            variant.thumbnail((width, image.height), Image.LANCZOS)
+            out = io.BytesIO()
+            variant.save(out, format="WEBP", quality=quality, method=4)
+            rendered.append((name, variant.width, variant.height, out.getvalue()))
+        return rendered
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS)
+        return _executor
+
+
+def shutdown():
+    """Stops the worker processes, if any were started."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def can_process(content_type: Optional[str]) -> bool:
+    return Image is not None and content_type in PROCESSABLE_TYPES
+
+
+async def create_variants(file: UploadFile, stored: storage.StoredFile) -> List[dict]:
+    """
+    Renders resized WebP copies of an uploaded image and stores them next to
+    the original (<name>_<variant>.webp). Returns one dict per stored variant;
+    an empty list if the file is not an image Pillow can process.
+    """
+    if not can_process(file.content_type):
+        return []
+    await file.seek(0)
+    data = await file.read()
+    loop = asyncio.get_running_loop()
+    rendered = await loop.run_in_executor(_get_executor(), _render_variants, data, IMAGE_VARIANT_WIDTHS, IMAGE_WEBP_QUALITY)
+
+    stem = os.path.splitext(stored.path)[0]
+
+    async def store(name: str, width: int, height: int, body: bytes) -> dict:
+        url = await storage.save_bytes(f"{stem}_{name}.webp", body, "image/webp")
+        return {"name": name, "url": url, "width": width, "height": height}
+
+    return list(await asyncio.gather(*(store(*variant) for variant in rendered)))
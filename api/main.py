@@ -1,40 +1,92 @@
+import asyncio
 import os
-import uuid
 import secrets
-from datetime import timedelta
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from typing import List
-from urllib.parse import urlparse
-import socket
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import FastAPI, Depends, HTTPException, status, Query, BackgroundTasks, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from pydantic import BaseModel
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import Session
-from supabase import create_client, Client
 from typing import Optional
 
 load_dotenv()              
 
-from . import crud, models, schemas, security
+from . import activity_log, blobs, cache, conditional, crud, events, images, migrations, models, schemas, security, storage
 from .database import SessionLocal, engine
+from . import database
+from .pagination import NEXT_CURSOR_HEADER, next_cursor, parse_cursor, with_next_cursor
 from .settings import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     ALGORITHM,
+    DB_ASYNC,
+    DB_CREATE_SCHEMA,
     SECRET_KEY,
-    SUPABASE_URL,
-    SUPABASE_KEY,
-    SUPABASE_BUCKET_NAME,
+    STORAGE_BACKEND,
+    LOCAL_STORAGE_DIR,
 )
 
-BUCKET_NAME = SUPABASE_BUCKET_NAME
-
-# Create all database tables (if they don't exist yet)
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="sKonnect API")
+# --- Application Lifespan ---
+# Importing this module has no side effects: no network access, no database
+# queries and no file reads. Everything that needs them happens here.
+
+async def log_database_target():
+    """Logs which database host we use and whether it resolves, without the password."""
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        print("ERROR: DATABASE_URL not found in environment. Check your .env file.")
+        return
+    url = make_url(database_url)
+    print(f"Using DATABASE_URL: {url.render_as_string(hide_password=True)}")
+    if url.host:
+        try:
+            await asyncio.get_running_loop().getaddrinfo(url.host, url.port)
+        except Exception as e:
+            print(f"CRITICAL ERROR: Could not resolve hostname '{url.host}'. Error: {e}")
+
+async def warm_up_database(app: FastAPI):
+    """Opens pooled connections in the background, then marks the instance ready."""
+    try:
+        opened = await run_in_threadpool(database.warm_up_pool)
+        opened += await database.warm_up_async_pool()
+        print(f"Database pool warm-up opened {opened} connection(s).")
+    except Exception as e:
+        # Not fatal: requests open connections on demand and /ready reports the outage
+        print(f"Database pool warm-up failed: {e}")
+    app.state.warmed_up = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.warmed_up = False
+    await log_database_target()
+    if DB_CREATE_SCHEMA:
+        await run_in_threadpool(migrations.create_schema, engine)
+    if STORAGE_BACKEND == "local":
+        os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
+    await run_in_threadpool(crud.profanity_matcher.reload)
+    warm_up = asyncio.create_task(warm_up_database(app))
+    yield
+    warm_up.cancel()
+    events.shutdown()
+    # Write any buffered activity log entries before the worker exits
+    await run_in_threadpool(activity_log.writer.close)
+    # Close the storage backend's pooled HTTP connections and the image workers
+    await storage.backend.close()
+    images.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+    engine.dispose()
+
+app = FastAPI(title="sKonnect API", lifespan=lifespan)
 
 # --- CORS Middleware Setup ---
 origins = [
@@ -53,28 +105,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods (GET, POST, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],  # Lets the frontend read pagination cursors and ETags
 )
 
-# --- Supabase Client and Settings ---
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-BUCKET_NAME = "post-media"  # Consolidated bucket name for images and videos
-
-# --- Database Connection Debugging ---
-print("--- Starting Connection Debug ---")
-database_url = os.getenv("DATABASE_URL")
-if database_url:
-    print(f"Successfully loaded DATABASE_URL: {database_url}")
-    try:
-        hostname = urlparse(database_url).hostname
-        print(f"Extracted hostname to test: {hostname}")
-        ip_address = socket.gethostbyname(hostname)
-        print(f"SUCCESS: Hostname resolved to IP Address: {ip_address}")
-    except Exception as e:
-        print(f"\nCRITICAL ERROR: Could not resolve hostname '{hostname}'. Error: {e}")
-        exit()
-else:
-    print("ERROR: DATABASE_URL not found in environment. Check your .env file.")
-    exit()
+if STORAGE_BACKEND == "local":
+    # Serve locally stored uploads so the URLs returned by the upload endpoints work
+    # (the directory is created on startup)
+    app.mount("/storage", StaticFiles(directory=LOCAL_STORAGE_DIR, check_dir=False), name="storage")
 
 # --- Dependencies ---
 
@@ -88,6 +125,13 @@ def get_db():
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# --- Public Response Caching ---
+
+def content_validators(request: Request, db: Session, namespace: str) -> dict:
+    """Builds ETag/Last-Modified headers from a single content version lookup."""
+    version, updated_at = crud.get_content_version(db, namespace)
+    return conditional.make_validators(namespace, version, updated_at, request)
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """Dependency to get the current user from a JWT token."""
     credentials_exception = HTTPException(
@@ -95,6 +139,7 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # The signature and expiry are always checked; only the user lookup is cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -104,10 +149,24 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = crud.get_user_by_username(db, username=token_data.username)
-    if user is None:
-        raise credentials_exception
-    return user
+    cached_user = cache.get_user(token)
+    if cached_user is not None:
+        return schemas.User.model_validate_json(cached_user)
+
+    with cache.user_lookup_lock(token):
+        # Another request with the same token may have loaded the user meanwhile
+        cached_user = cache.get_user(token)
+        if cached_user is not None:
+            return schemas.User.model_validate_json(cached_user)
+
+        generation = cache.user_cache.generation(cache.USERS_NAMESPACE)
+        user = crud.get_user_by_username(db, username=token_data.username)
+        if user is None:
+            raise credentials_exception
+        principal = schemas.User.model_validate(user)
+        expires_in = payload["exp"] - time.time() if "exp" in payload else None
+        cache.store_user(token, generation, principal.model_dump_json().encode("utf-8"), ttl=expires_in)
+        return principal
 
 def get_current_active_admin(current_user: schemas.User = Depends(get_current_user)):
     """Dependency to ensure the current user is an active and approved admin."""
@@ -121,24 +180,37 @@ def get_current_active_admin(current_user: schemas.User = Depends(get_current_us
 # --- Authentication Endpoints ---
 
 @app.post("/token", response_model=schemas.Token, tags=["Authentication"])
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
     """Provides a JWT access token for a valid user."""
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
+    # Database calls go to the threadpool; the bcrypt check goes to its own bounded executor
+    user = await run_in_threadpool(crud.get_user_by_username, db, form_data.username)
+    try:
+        verified, new_hash = await security.verify_and_update_password_offloaded(
+            form_data.password, user.hashed_password if user else None
+        )
+    except security.PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        await run_in_threadpool(crud.update_password_hash, db, user, new_hash)
     if not user.is_approved:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Admin account is not yet approved"
         )
 
-    crud.create_activity_log(db, user=user, action="USER_LOGIN")
+    activity_log.record(user, action="USER_LOGIN")
 
     access_token_expires = timedelta(minutes=int(ACCESS_TOKEN_EXPIRE_MINUTES))
     access_token = security.create_access_token(
@@ -159,11 +231,9 @@ def register_admin(user: schemas.UserCreate, db: Session = Depends(get_db)):
     new_user = crud.create_user(db=db, user=user)
 
     if is_first_user:
-        new_user.is_approved = True
-        db.commit()
-        db.refresh(new_user)
-        crud.create_activity_log(
-            db, user=new_user, action="AUTO_APPROVED_FIRST_ADMIN"
+        crud.approve_user(db, new_user)
+        activity_log.record(
+            user=new_user, action="AUTO_APPROVED_FIRST_ADMIN"
         )
     return new_user
 
@@ -188,60 +258,45 @@ def approve_admin(
     if user_to_approve.is_approved:
         raise HTTPException(status_code=400, detail="User is already approved")
         
-    user_to_approve.is_approved = True
-    db.commit()
-    db.refresh(user_to_approve)
-    crud.create_activity_log(
-        db, user=current_admin, action="APPROVED_ADMIN", details=f"Approved user ID: {user_id}"
+    crud.approve_user(db, user_to_approve)
+    activity_log.record(
+        user=current_admin, action="APPROVED_ADMIN", details=f"Approved user ID: {user_id}"
     )
     return user_to_approve
 
 # --- Post and Media Endpoints ---
 
 @app.post("/admin/generate-upload-url", tags=["Admin Posts"])
-def create_upload_url(
+async def create_upload_url(
     file_name: str,
     post_folder: str,
     current_admin: schemas.User = Depends(get_current_active_admin)
 ):
     """Generates a pre-signed URL for uploading media to a specific folder."""
-    
-    # --- DEBUGGING STARTS HERE ---
-    print("\n--- Generating Upload URL ---")
-    print(f"Received file_name: {file_name}")
-    print(f"Received post_folder: {post_folder}")
-    
-    # Let's check the bucket name from your .env file
-    print(f"Using BUCKET_NAME: '{BUCKET_NAME}'")
-    
-    if not BUCKET_NAME:
-        print("ERROR: BUCKET_NAME is not set in the environment!")
-        raise HTTPException(status_code=500, detail="Server configuration error: BUCKET_NAME is missing.")
-    # --- DEBUGGING ENDS HERE ---
-
+    path = f"{post_folder}/{file_name}"
     try:
-        path = f"{post_folder}/{file_name}"
-        print(f"Constructed path for Supabase: {path}")
-
-        # This is the line that is likely failing.
-        print("Attempting to call supabase.storage.create_signed_upload_url...")
-        signed_url_response = supabase.storage.create_signed_upload_url(BUCKET_NAME, path)
-        print("Successfully generated signed URL.")
-        
-        public_url = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{path}"
-        
-        return {
-            "signed_url": signed_url_response['signedUrl'],
-            "public_url": public_url,
-        }
+        return await storage.backend.create_signed_upload_url(path)
     except Exception as e:
-        # This will now print the EXACT error to your terminal
-        print("\n!!!!!!!!!! AN ERROR OCCURRED !!!!!!!!!!")
-        print(f"Error Type: {type(e)}")
-        print(f"Error Details: {e}")
-        print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!\n")
+        print(f"ERROR generating upload URL for '{path}': {e}")
         raise HTTPException(status_code=500, detail=f"Could not generate upload URL: {str(e)}")
     
+@app.post("/admin/generate-upload-urls", response_model=List[schemas.UploadUrl], tags=["Admin Posts"])
+async def create_upload_urls(
+    batch: schemas.UploadUrlBatchRequest,
+    current_admin: schemas.User = Depends(get_current_active_admin)
+):
+    """Generates pre-signed upload URLs for several files of a post folder in one request."""
+    paths = [f"{batch.post_folder}/{file_name}" for file_name in batch.file_names]
+    try:
+        signed = await storage.create_signed_upload_urls(paths)
+    except Exception as e:
+        print(f"ERROR generating upload URLs: {e}")
+        raise HTTPException(status_code=500, detail=f"Could not generate upload URLs: {str(e)}")
+    return [
+        schemas.UploadUrl(file_name=file_name, **urls)
+        for file_name, urls in zip(batch.file_names, signed)
+    ]
+
 @app.post("/admin/posts/", response_model=schemas.Post, status_code=status.HTTP_201_CREATED, tags=["Admin Posts"])
 def create_new_post(
     post: schemas.PostCreate,
@@ -249,9 +304,9 @@ def create_new_post(
     current_admin: schemas.User = Depends(get_current_active_admin),
 ):
     """Creates a new post with title, content, and media."""
-    new_post = crud.create_post(db=db, post=post, user_id=current_admin.id)
-    crud.create_activity_log(
-        db, user=current_admin, action="CREATED_POST", details=f"Post ID: {new_post.id}"
+    new_post = crud.create_post(db=db, post=post, author=current_admin)
+    activity_log.record(
+        user=current_admin, action="CREATED_POST", details=f"Post ID: {new_post.id}"
     )
     return new_post
 
@@ -263,14 +318,15 @@ def edit_post(
     current_admin: schemas.User = Depends(get_current_active_admin),
 ):
     """Updates a post's content."""
-    db_post = crud.get_post(db, post_id=post_id)
+    db_post = crud.update_post(db=db, post_id=post_id, post_update=post)
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return crud.update_post(db=db, post_id=post_id, post_update=post)
+    return db_post
 
 @app.delete("/admin/posts/{post_id}", response_model=schemas.Post, tags=["Admin Posts"])
 def delete_a_post(
     post_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_admin: schemas.User = Depends(get_current_active_admin),
 ):
@@ -280,8 +336,11 @@ def delete_a_post(
         raise HTTPException(status_code=404, detail="Post not found")
     
     crud.delete_post(db, post_id=post_id)
-    crud.create_activity_log(
-        db,
+    # Remove files left unused for longer than the grace period, after the
+    # response is sent. This post's own files are still inside it, so a later
+    # run collects them.
+    background_tasks.add_task(blobs.collect_garbage)
+    activity_log.record(
         user=current_admin,
         action="DELETED_POST",
         details=f"Post ID: {post_id}, Title: {post_to_delete.title}",
@@ -302,65 +361,140 @@ def delete_a_comment(
     crud.delete_comment(db, comment_id=comment_id)
     return comment_to_delete
 
-@app.post("/admin/upload-announcement-image", tags=["Admin Announcements"])
-def upload_announcement_image(
-    file: UploadFile = File(...),
-    current_admin: schemas.User = Depends(get_current_active_admin)
+async def store_image_upload(upload: blobs.HashedUpload, db: Session) -> dict:
+    """Stores an upload (once per distinct file), then renders and records its resized variants."""
+    stored = await blobs.store_upload(upload, db)
+    variants = []
+    if not stored.is_new:
+        existing = await run_in_threadpool(crud.get_image_variants, db, stored.url)
+        variants = [schemas.ImageVariant.model_validate(variant).model_dump() for variant in existing]
+    try:
+        if not variants:
+            variants = await images.create_variants(upload.file, stored)
+            await run_in_threadpool(crud.create_image_variants, db, stored.url, variants)
+    except Exception as e:
+        # The original is stored either way; it is just served without variants
+        print(f"ERROR generating image variants for {stored.path}: {e}")
+        variants = []
+    return {"public_url": stored.url, "variants": variants}
+
+@app.post("/admin/upload-announcement-image", tags=["Admin Announcements"], openapi_extra=blobs.UPLOAD_REQUEST_BODY)
+async def upload_announcement_image(
+    current_admin: schemas.User = Depends(get_current_active_admin),
+    upload: blobs.HashedUpload = Depends(blobs.receive_upload),
+    db: Session = Depends(get_db),
 ):
     """
-    Accepts an image file, uploads it to Supabase with a unique name,
-    and returns the public URL.
+    Accepts an image file, stores it under its content hash (reusing an
+    identical earlier upload), and returns the public URL along with its
+    resized variants.
     """
     try:
-        # Generate a unique filename to prevent overwriting files
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        path = f"announcements/{unique_filename}"  # Save in an 'announcements' folder
-        
-        # Read the file content
-        file_content = file.file.read()
-
-        # Upload the file to your Supabase bucket
-        supabase.storage.from_(BUCKET_NAME).upload(
-            path=path,
-            file=file_content,
-            file_options={"content-type": file.content_type}
-        )
-        
-        # Construct and return the public URL
-        public_url = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{path}"
-        return {"public_url": public_url}
-
+        return await store_image_upload(upload, db)
     except Exception as e:
         print(f"ERROR in upload_announcement_image: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Public Endpoints ---
 
-@app.get("/posts/", response_model=List[schemas.Post], tags=["Public"])
-def read_posts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    """Reads all posts with pagination."""
-    return crud.get_posts(db, skip=skip, limit=limit)
-
-@app.get("/posts/{post_id}", response_model=schemas.Post, tags=["Public"])
-def read_post(post_id: int, db: Session = Depends(get_db)):
-    """Reads a single post and its comments."""
-    db_post = crud.get_post(db, post_id=post_id)
+@app.get("/posts/", response_model=List[schemas.PostSummary], tags=["Public"])
+def read_posts(
+    request: Request,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    db: Session = Depends(get_db),
+):
+    """Reads post summaries (no comment lists, only counts) with pagination."""
+    key = cache.cache_key(cache.POSTS_NAMESPACE, request)
+    cached = cache.cached_or_not_modified(request, key)
+    if cached is not None:
+        return cached
+
+    generation = cache.public_cache.generation(cache.POSTS_NAMESPACE)
+    validators = content_validators(request, db, cache.POSTS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
+    posts = crud.get_post_summaries(db, skip=skip, limit=limit, cursor=parse_cursor(cursor))
+    headers = with_next_cursor(validators, posts, "created_at", limit)
+    return cache.cache_response(key, generation, schemas.PostSummaryList, posts, headers)
+
+@app.get("/posts/search", response_model=List[schemas.PostSearchResult], tags=["Public"])
+def search_posts(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for; supports \"quoted phrases\" and -excluded words"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """Searches post titles and content, best matches first, with highlighted snippets."""
+    key = cache.cache_key(cache.POSTS_NAMESPACE, request)
+    cached = cache.cached_or_not_modified(request, key)
+    if cached is not None:
+        return cached
+
+    generation = cache.public_cache.generation(cache.POSTS_NAMESPACE)
+    validators = content_validators(request, db, cache.POSTS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
+    posts = crud.search_posts(db, q, skip=skip, limit=limit)
+    return cache.cache_response(key, generation, schemas.PostSearchResultList, posts, validators)
+
+@app.get("/posts/{post_id}", response_model=schemas.PostDetail, tags=["Public"])
+def read_post(
+    request: Request,
+    post_id: int,
+    comment_skip: int = Query(0, ge=0),
+    comment_limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+):
+    """Reads a single post and a page of its comments."""
+    key = cache.cache_key(cache.POSTS_NAMESPACE, request)
+    cached = cache.cached_or_not_modified(request, key)
+    if cached is not None:
+        return cached
+
+    generation = cache.public_cache.generation(cache.POSTS_NAMESPACE)
+    validators = content_validators(request, db, cache.POSTS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
+    db_post, comments = crud.get_post_detail(db, post_id=post_id, comment_skip=comment_skip, comment_limit=comment_limit)
     if db_post is None:
         raise HTTPException(status_code=404, detail="Post not found")
-    return db_post
+    post_detail = schemas.post_detail(db_post, comments)
+    return cache.cache_response(key, generation, schemas.PostDetailAdapter, post_detail, validators)
 
 @app.post("/posts/{post_id}/comments/", response_model=schemas.Comment, status_code=status.HTTP_201_CREATED, tags=["Public"])
 def create_comment_for_post(
     post_id: int, comment: schemas.CommentCreate, db: Session = Depends(get_db)
 ):
     """Creates a comment on a specific post."""
-    db_post = crud.get_post(db, post_id=post_id)
-    if db_post is None:
+    if not crud.post_exists(db, post_id=post_id):
         raise HTTPException(status_code=404, detail="Post not found")
     # The logic for setting is_inappropriate is now handled within crud.create_comment
     return crud.create_comment(db=db, comment=comment, post_id=post_id)
 
+def post_exists(post_id: int) -> bool:
+    """Checks a post exists with a short-lived session (WebSockets stay open for long)."""
+    db = SessionLocal()
+    try:
+        return crud.post_exists(db, post_id=post_id)
+    finally:
+        db.close()
+
+@app.websocket("/ws/posts/{post_id}/comments")
+async def post_comment_stream(websocket: WebSocket, post_id: int):
+    """
+    Pushes comments of a post to a viewer as they are added, flagged, unflagged
+    or deleted: JSON messages of type "comment.added" (with the comment) or
+    "comment.removed" (with its id). Connect before loading the comments so
+    none can slip in between; on close code 1013, reload and reconnect.
+    """
+    if not await run_in_threadpool(post_exists, post_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Post not found")
+        return
+    await events.comment_hub.serve(websocket, post_id=post_id)
+
 # --- Document Request Endpoints ---
 
 class StatusUpdateRequest(BaseModel):
@@ -397,13 +531,36 @@ def create_document_request(
 @app.get("/document-requests/status/{request_token}", response_model=schemas.DocumentRequest, tags=["Public Document Requests"])
 def get_document_request_status(request_token: str, db: Session = Depends(get_db)):
     """Fetches the status of a document request using its token."""
-    db_request = db.query(models.DocumentRequest).filter(
-        models.DocumentRequest.request_token == request_token
-    ).first()
+    db_request = crud.get_document_request_by_token(db, request_token)
     if db_request is None:
         raise HTTPException(status_code=404, detail="Request token not found.")
     return db_request
 
+@app.get("/document-requests/status/{request_token}/events", tags=["Public Document Requests"])
+async def stream_document_request_status(request_token: str, request: Request):
+    """
+    Streams the status of a document request as Server-Sent Events: the
+    current status first, then every change as an admin makes it.
+    """
+    try:
+        # Subscribe before reading the current status so no change can slip in between
+        queue = events.broker.subscribe(request_token)
+    except events.TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Too many open status streams, try again later.")
+    try:
+        current = await run_in_threadpool(events.current_status, request_token)
+    except Exception:
+        events.broker.unsubscribe(request_token, queue)
+        raise
+    if current is None:
+        events.broker.unsubscribe(request_token, queue)
+        raise HTTPException(status_code=404, detail="Request token not found.")
+    return StreamingResponse(
+        events.status_stream(request, request_token, queue, current),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # Don't let proxies buffer the stream
+    )
+
 @app.patch("/admin/document-requests/{request_id}/status", response_model=schemas.DocumentRequest, tags=["Admin Document Requests"])
 def update_request_status(
     request_id: int,
@@ -412,36 +569,77 @@ def update_request_status(
     current_admin: schemas.User = Depends(get_current_active_admin),
 ):
     """Updates the status and adds an optional message for a document request."""
-    db_request = db.query(models.DocumentRequest).filter(models.DocumentRequest.id == request_id).first()
+    db_request = crud.get_document_request_by_id(db, request_id=request_id)
     
     if db_request is None:
         raise HTTPException(status_code=404, detail="Document request not found.")
     
     # Update both status and the new message field
-    db_request.status = status_update.status
-    db_request.admin_message = status_update.admin_message
-    
-    db.commit()
+    crud.update_request_status(db, db_request, status_update)
 
-    crud.create_activity_log(
-        db=db, 
+    activity_log.record(
         user=current_admin, 
         action="UPDATED_REQUEST_STATUS",
         details=f"Admin '{current_admin.username}' set status of request ID {db_request.id} to '{status_update.status.value}'."
     )
     
-    db.refresh(db_request)
     return db_request
 
 
 @app.get("/admin/requests/", response_model=List[schemas.DocumentRequest], tags=["Admin Document Requests"])
 def view_document_requests(
+    response: Response,
+    db: Session = Depends(get_db),
+    status: Optional[str] = None,
+    document_type: Optional[str] = None,
+    start_date: Optional[datetime] = Query(None, description="Only requests created at or after this time"),
+    end_date: Optional[datetime] = Query(None, description="Only requests created before this time"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
+    current_admin: schemas.User = Depends(get_current_active_admin),
+):
+    """Views submitted document requests page by page, with optional filters for status, document_type and date range."""
+    requests = crud.get_document_requests(
+        db,
+        status=status,
+        document_type=document_type,
+        start_date=start_date,
+        end_date=end_date,
+        skip=skip,
+        limit=limit,
+        cursor=parse_cursor(cursor),
+    )
+    page_cursor = next_cursor(requests, "created_at", limit)
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
+    return requests
+
+@app.get("/admin/requests/summary", response_model=schemas.DocumentRequestSummary, tags=["Admin Document Requests"])
+def view_document_request_summary(
     db: Session = Depends(get_db),
+    document_type: Optional[str] = None,
+    start_date: Optional[datetime] = Query(None, description="Only requests created at or after this time"),
+    end_date: Optional[datetime] = Query(None, description="Only requests created before this time"),
+    current_admin: schemas.User = Depends(get_current_active_admin),
+):
+    """Returns the total number of document requests and the count for each status."""
+    return crud.get_document_request_summary(db, document_type=document_type, start_date=start_date, end_date=end_date)
+
+@app.get("/admin/requests/search", response_model=List[schemas.DocumentRequestSearchResult], tags=["Admin Document Requests"])
+def search_document_requests(
+    q: str = Query(..., min_length=1, max_length=200, description="Part of a requester's name or address; misspellings are tolerated"),
     status: Optional[str] = None,
-    document_type: Optional[str] = None
+    document_type: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_admin: schemas.User = Depends(get_current_active_admin),
 ):
-    """Views all submitted document requests, with optional filters for status and document_type."""
-    return crud.get_document_requests(db, status=status, document_type=document_type)
+    """Looks up document requests by requester name or address, closest matches first."""
+    return crud.search_document_requests(
+        db, q, status=status, document_type=document_type, skip=skip, limit=limit
+    )
 
 @app.get("/admin/requests/{request_id}", response_model=schemas.DocumentRequest, tags=["Admin Document Requests"])
 def view_single_document_request(
@@ -459,18 +657,32 @@ def view_single_document_request(
 
 @app.get("/admin/logs/", response_model=List[schemas.ActivityLog], tags=["Admin"])
 def read_activity_logs(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100), # Limiting to 20 per page as requested
     sort_by: str = Query("timestamp", enum=["timestamp", "user", "action"]),
     sort_order: str = Query("desc", enum=["asc", "desc"]),
+    cursor: Optional[str] = Query(None, description="Keyset cursor, only supported when sorting by timestamp"),
     db: Session = Depends(get_db),
     current_admin: schemas.User = Depends(get_current_active_admin),
 ):
     """
     Retrieves a list of admin activity logs with pagination and sorting.
     Sortable by timestamp, user (display name), and action.
+    When sorting by timestamp, the next page cursor is returned in the X-Next-Cursor header.
     """
-    return crud.get_activity_logs(db, skip=skip, limit=limit, sort_by=sort_by, sort_order=sort_order)
+    if cursor is not None and sort_by != "timestamp":
+        raise HTTPException(status_code=400, detail="Cursor pagination is only supported when sorting by timestamp")
+    # Make entries still waiting in this worker's buffer visible
+    activity_log.writer.flush()
+    logs = crud.get_activity_logs(
+        db, skip=skip, limit=limit, sort_by=sort_by, sort_order=sort_order, cursor=parse_cursor(cursor)
+    )
+    if sort_by == "timestamp":
+        page_cursor = next_cursor(logs, "timestamp", limit)
+        if page_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page_cursor
+    return logs
 
 # --- Barangay Officials Endpoint ---
 def get_current_admin(current_user: models.User = Depends(get_current_user)):
@@ -485,12 +697,21 @@ def get_current_admin(current_user: models.User = Depends(get_current_user)):
     return current_user
 
 @app.get("/officials/", response_model=List[schemas.Official], tags=["Officials"])
-def read_officials(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_officials(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """
     Get a list of all barangay officials. This is a public endpoint.
     """
+    key = cache.cache_key(cache.OFFICIALS_NAMESPACE, request)
+    cached = cache.cached_or_not_modified(request, key)
+    if cached is not None:
+        return cached
+
+    generation = cache.public_cache.generation(cache.OFFICIALS_NAMESPACE)
+    validators = content_validators(request, db, cache.OFFICIALS_NAMESPACE)
+    if conditional.is_not_modified(request, validators):
+        return conditional.not_modified_response(validators)
     officials = crud.get_officials(db, skip=skip, limit=limit)
-    return officials
+    return cache.cache_response(key, generation, schemas.OfficialList, officials, validators)
 
 @app.post("/admin/officials/", response_model=schemas.Official, tags=["Admin - Officials"])
 def create_new_official(
@@ -521,6 +742,7 @@ def update_existing_official(
 @app.delete("/admin/officials/{official_id}", response_model=schemas.Official, tags=["Admin - Officials"])
 def delete_existing_official(
     official_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_admin: models.User = Depends(get_current_admin) # Protect this route
 ):
@@ -530,51 +752,47 @@ def delete_existing_official(
     db_official = crud.delete_official(db, official_id)
     if db_official is None:
         raise HTTPException(status_code=404, detail="Official not found")
+    # Collects files unused past the grace period; the official's photo is collected by a later run
+    background_tasks.add_task(blobs.collect_garbage)
     return db_official
 
-@app.post("/admin/upload-official-image", tags=["Admin Posts"])
-def upload_official_image(
-    file: UploadFile = File(...),
-    current_admin: schemas.User = Depends(get_current_active_admin)
+@app.post("/admin/media/collect-garbage", tags=["Admin Posts"])
+async def collect_unused_media(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Deletes stored files that no post or official has used for the grace period."""
+    return {"deleted": await blobs.collect_garbage()}
+
+@app.post("/admin/upload-official-image", tags=["Admin Posts"], openapi_extra=blobs.UPLOAD_REQUEST_BODY)
+async def upload_official_image(
+    current_admin: schemas.User = Depends(get_current_active_admin),
+    upload: blobs.HashedUpload = Depends(blobs.receive_upload),
+    db: Session = Depends(get_db),
 ):
-    """Uploads an image file to Supabase storage with a unique filename."""
+    """Stores an image file under its content hash and generates its variants."""
     try:
-        # Generate a unique filename to prevent overwriting files
-        file_extension = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        path = f"officials/{unique_filename}"
-        
-        # Read the file's content
-        file_content = file.file.read()
-
-        # Upload the file to your Supabase bucket
-        supabase.storage.from_(BUCKET_NAME).upload(
-            path=path,
-            file=file_content,
-            file_options={"content-type": file.content_type}
-        )
-        
-        # Construct the public URL for the file
-        public_url = f"{SUPABASE_URL}/storage/v1/object/public/{BUCKET_NAME}/{path}"
-        
-        # Return the URL in the response
-        return {"public_url": public_url}
-
+        return await store_image_upload(upload, db)
     except Exception as e:
         print(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
 @app.get("/admin/comments/", response_model=List[schemas.Comment], tags=["Admin Comments"])
 def get_all_comments(
+    response: Response,
     db: Session = Depends(get_db),
     post_id: Optional[int] = Query(None, description="Filter comments by post ID"),
     is_inappropriate: Optional[bool] = Query(None, description="Filter comments by inappropriate status"),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description=f"Cursor from the {NEXT_CURSOR_HEADER} header of the previous page"),
     current_admin: schemas.User = Depends(get_current_active_admin),
 ):
     """Retrieve all comments, with optional filtering by post ID or inappropriate status."""
-    return crud.get_comments(db, post_id=post_id, is_inappropriate=is_inappropriate, skip=skip, limit=limit)
+    comments = crud.get_comments(
+        db, post_id=post_id, is_inappropriate=is_inappropriate, skip=skip, limit=limit, cursor=parse_cursor(cursor)
+    )
+    page_cursor = next_cursor(comments, "created_at", limit)
+    if page_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page_cursor
+    return comments
 
 @app.patch("/admin/comments/{comment_id}/flag", response_model=schemas.Comment, tags=["Admin Comments"])
 def flag_comment(
@@ -586,7 +804,7 @@ def flag_comment(
     db_comment = crud.mark_comment_inappropriate(db, comment_id, True)
     if not db_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-    crud.create_activity_log(db, user=current_admin, action="FLAGGED_COMMENT", details=f"Comment ID: {comment_id}")
+    activity_log.record(user=current_admin, action="FLAGGED_COMMENT", details=f"Comment ID: {comment_id}")
     return db_comment
 
 @app.patch("/admin/comments/{comment_id}/unflag", response_model=schemas.Comment, tags=["Admin Comments"])
@@ -599,5 +817,150 @@ def unflag_comment(
     db_comment = crud.mark_comment_inappropriate(db, comment_id, False)
     if not db_comment:
         raise HTTPException(status_code=404, detail="Comment not found")
-    crud.create_activity_log(db, user=current_admin, action="UNFLAGGED_COMMENT", details=f"Comment ID: {comment_id}")
-    return db_comment
\ No newline at end of file
+    activity_log.record(user=current_admin, action="UNFLAGGED_COMMENT", details=f"Comment ID: {comment_id}")
+    return db_comment
+
+def websocket_admin(token: str) -> Optional[schemas.User]:
+    """Resolves a WebSocket's token to an active, approved admin, or None."""
+    db = SessionLocal()
+    try:
+        return get_current_active_admin(get_current_user(token, db))
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+@app.websocket("/ws/admin/comments")
+async def moderation_comment_stream(websocket: WebSocket, token: str = Query(...), post_id: Optional[int] = Query(None)):
+    """
+    Pushes every comment event ("comment.created", "comment.flagged",
+    "comment.unflagged", "comment.deleted") to the moderation screen,
+    including flagged comments, for all posts or only post_id. Browsers
+    cannot set headers on WebSockets, so the access token is a query parameter.
+    """
+    if await run_in_threadpool(websocket_admin, token) is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="User is not an approved administrator.")
+        return
+    await events.comment_hub.serve(websocket, post_id=post_id, moderator=True)
+
+# --- Moderation Endpoints ---
+
+@app.post("/admin/moderation/check", response_model=schemas.ProfanityCheckResult, tags=["Admin Comments"])
+def check_text_for_profanity(
+    payload: schemas.ProfanityCheckRequest,
+    current_admin: schemas.User = Depends(get_current_active_admin),
+):
+    """Runs the profanity filter over a text and returns the positions of any matches."""
+    matches = crud.find_inappropriate_words(payload.text)
+    return {
+        "is_inappropriate": bool(matches),
+        "matches": [match._asdict() for match in matches],
+    }
+
+@app.post("/admin/moderation/reload-words", response_model=schemas.SwearWordsReloadResult, tags=["Admin Comments"])
+def reload_swear_words(
+    db: Session = Depends(get_db),
+    current_admin: schemas.User = Depends(get_current_active_admin),
+):
+    """Reloads the swear words list from disk without restarting the server."""
+    word_count = crud.reload_swear_words()
+    activity_log.record(user=current_admin, action="RELOADED_SWEAR_WORDS", details=f"Word count: {word_count}")
+    return {"word_count": word_count}
+
+def run_comment_rescan_job(rescan: schemas.CommentRescanRequest, admin_id: int):
+    """Background job that re-moderates comments using its own DB session."""
+    db = SessionLocal()
+    try:
+        result = crud.rescan_comments(db, **rescan.model_dump())
+        activity_log.writer.record(
+            admin_id,
+            action="RESCANNED_COMMENTS",
+            details=f"Scanned: {result['scanned']}, flagged: {result['flagged']}, unflagged: {result['unflagged']}",
+        )
+    except Exception as e:
+        print(f"ERROR in run_comment_rescan_job: {e}")
+    finally:
+        db.close()
+
+@app.post("/admin/comments/rescan", response_model=schemas.CommentRescanResult, tags=["Admin Comments"])
+def rescan_comments(
+    rescan: schemas.CommentRescanRequest,
+    background_tasks: BackgroundTasks,
+    run_in_background: bool = Query(False, description="Queue the re-scan instead of waiting for it"),
+    db: Session = Depends(get_db),
+    current_admin: schemas.User = Depends(get_current_active_admin),
+):
+    """
+    Re-runs the profanity filter over existing comments, optionally limited to a
+    post or a date range, and bulk-updates their inappropriate flags.
+    """
+    if run_in_background:
+        background_tasks.add_task(run_comment_rescan_job, rescan, current_admin.id)
+        return {"queued": True}
+
+    result = crud.rescan_comments(db, **rescan.model_dump())
+    activity_log.record(
+        user=current_admin,
+        action="RESCANNED_COMMENTS",
+        details=f"Scanned: {result['scanned']}, flagged: {result['flagged']}, unflagged: {result['unflagged']}",
+    )
+    return result
+
+# --- Cache Endpoints ---
+
+@app.get("/admin/cache/stats", tags=["Admin"])
+def read_cache_stats(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Returns hit/miss counters and size of the public response cache and the user cache."""
+    return {"public": cache.public_cache.stats(), "users": cache.user_cache.stats()}
+
+@app.get("/admin/metrics/db-pool", tags=["Admin"])
+def read_db_pool_metrics(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Returns connection pool usage: checkout wait times, connections in use and overflow events."""
+    metrics = {"sync": database.pool_metrics.snapshot(engine.pool)}
+    if database.async_engine is not None:
+        metrics["async"] = database.async_pool_metrics.snapshot(database.async_engine.sync_engine.pool)
+    return metrics
+
+@app.get("/admin/metrics/password-hashing", tags=["Admin"])
+def read_password_hashing_metrics(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Returns the login hashing executor's queue depth and counters."""
+    return security.password_hashing_stats()
+
+@app.get("/admin/metrics/activity-log", tags=["Admin"])
+def read_activity_log_metrics(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Returns the state of the buffered activity log writer."""
+    return activity_log.writer.stats()
+
+@app.get("/admin/metrics/status-streams", tags=["Admin"])
+def read_status_stream_metrics(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Returns open document request status streams and the changes published to them."""
+    return events.broker.stats()
+
+@app.get("/admin/metrics/comment-streams", tags=["Admin"])
+def read_comment_stream_metrics(current_admin: schemas.User = Depends(get_current_active_admin)):
+    """Returns open live comment WebSockets and how many slow clients were disconnected."""
+    return events.comment_hub.stats()
+
+# --- Health Endpoints ---
+
+@app.get("/ready", tags=["Health"])
+async def readiness(response: Response):
+    """Reports whether this instance has finished starting up and can reach the database."""
+    if not getattr(app.state, "warmed_up", False):
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "starting"}
+    try:
+        await run_in_threadpool(database.check_connection)
+    except Exception as e:
+        print(f"Readiness check failed: {e}")
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        return {"status": "unavailable", "database": "unreachable"}
+    return {"status": "ready", "database": "ok"}
+
+# --- Async Database Path ---
+
+if DB_ASYNC:
+    from . import async_routes
+
+    # Swap the public endpoints for versions that use the asyncpg engine
+    async_routes.install(app)
@@ -0,0 +1,110 @@
+"""
+Schema setup, run once per deploy before the new instances start:
+
+    python -m api.migrations
+
+It creates missing tables and indexes, the post search column and the
+trigram indexes. The API only does this itself at startup when
+DB_CREATE_SCHEMA is turned on, which is meant for local development.
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+
+from . import models, search
+
+
+def create_schema(engine: Engine) -> list:
+    """Creates missing tables and indexes and returns the names of the indexes it added."""
+    models.Base.metadata.create_all(bind=engine)
+    # create_all skips indexes on tables that already exist, so add any missing ones
+    created = ensure_indexes(engine)
+    ensure_search_index(engine)
+    ensure_trigram_indexes(engine)
+    return created
+
+
+def _ddl_connection(engine: Engine):
+    # Postgres builds indexes CONCURRENTLY so that writes to a live table
+    # carry on meanwhile, which cannot run inside a transaction
+    if engine.dialect.name == "postgresql":
+        return engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+    return engine.begin()
+
+
+def create_index_statement(index, dialect) -> str:
+    statement = str(CreateIndex(index).compile(dialect=dialect))
+    if dialect.name == "postgresql":
+        statement = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", statement)
+    return statement
+
+
+def ensure_indexes(engine: Engine) -> list:
+    """
+    Creates any index declared in api/models.py that is missing from the database.
+
+    Base.metadata.create_all only creates indexes together with new tables, so
+    databases created before an index was added never get it. This is safe to
+    run on every deploy because existing indexes are skipped.
+    """
+    created = []
+    with _ddl_connection(engine) as connection:
+        for table in models.Base.metadata.sorted_tables:
+            if not engine.dialect.has_table(connection, table.name):
+                continue
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if engine.dialect.has_index(connection, table.name, index.name):
+                    continue
+                connection.exec_driver_sql(create_index_statement(index, engine.dialect))
+                created.append(index.name)
+    return created
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """
+    Adds the generated full-text search column and its GIN index to posts.
+
+    Only Postgres has them; other databases (SQLite in tests) search with
+    LIKE instead. Returns whether the column exists afterwards.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with _ddl_connection(engine) as connection:
+        for statement in search.SEARCH_VECTOR_DDL:
+            connection.execute(text(statement))
+    return True
+
+
+def ensure_trigram_indexes(engine: Engine) -> bool:
+    """
+    Enables pg_trgm and adds the trigram indexes used to look up document
+    requests by a partial or misspelled name or address. Postgres only;
+    returns whether the indexes exist afterwards.
+    """
+    if engine.dialect.name != "postgresql":
+        return False
+    with _ddl_connection(engine) as connection:
+        for statement in search.TRIGRAM_INDEX_DDL:
+            connection.execute(text(statement))
+    return True
+
+
+def main():
+    from .database import engine
+
+    created_indexes = create_schema(engine)
+    if engine.dialect.name == "postgresql":
+        print("Post search column and document request trigram indexes are in place.")
+    if created_indexes:
+        print("Created indexes:")
+        for name in created_indexes:
+            print(f"  {name}")
+    else:
+        print("All indexes are up to date.")
+
+
+if __name__ == "__main__":
+    # Usage: python -m api.migrations
+    main()
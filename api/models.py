@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum as SAEnum
+    BigInteger, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, Enum as SAEnum
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -29,14 +29,31 @@ class Post(Base):
     author = relationship("User", back_populates="posts")
     media = relationship("Media", back_populates="post", cascade="all, delete-orphan")
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
+    primary_image_variants = relationship(
+        "ImageVariant",
+        primaryjoin="foreign(ImageVariant.source_url) == Post.primary_image_url",
+        order_by="ImageVariant.width",
+        viewonly=True,
+    )
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+    )
+    # Fetch server-generated created_at in the INSERT's RETURNING clause instead of a refresh
+    __mapper_args__ = {"eager_defaults": True}
 
 class Media(Base):
     __tablename__ = "media"
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String, nullable=False)
     media_type = Column(SAEnum(MediaType), nullable=False)
-    post_id = Column(Integer, ForeignKey("posts.id"))
+    post_id = Column(Integer, ForeignKey("posts.id"), index=True)
     post = relationship("Post", back_populates="media")
+    variants = relationship(
+        "ImageVariant",
+        primaryjoin="foreign(ImageVariant.source_url) == Media.url",
+        order_by="ImageVariant.width",
+        viewonly=True,
+    )
 
 class Comment(Base):
     __tablename__ = "comments"
@@ -47,6 +64,15 @@ class Comment(Base):
     post_id = Column(Integer, ForeignKey("posts.id"))
     is_inappropriate = Column(Boolean, default=False)
     post = relationship("Post", back_populates="comments")
+    # created_at comes back with the INSERT, so a new comment can be announced before commit
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_comments_created_at_id", "created_at", "id"),
+        # Comments of a post, newest first (post detail page, moderation filter by post)
+        Index("ix_comments_post_id_created_at_id", "post_id", "created_at", "id"),
+        # Moderation queue filtered by flag, newest first
+        Index("ix_comments_is_inappropriate_created_at_id", "is_inappropriate", "created_at", "id"),
+    )
 
 class DocumentRequest(Base):
     __tablename__ = "document_requests"
@@ -62,6 +88,13 @@ class DocumentRequest(Base):
     status = Column(String, default="pending", nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    __table_args__ = (
+        # Admin queue: optional status/document_type filters, newest first
+        Index("ix_document_requests_created_at_id", "created_at", "id"),
+        Index("ix_document_requests_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_document_requests_document_type_created_at_id", "document_type", "created_at", "id"),
+        Index("ix_document_requests_status_document_type_created_at_id", "status", "document_type", "created_at", "id"),
+    )
 
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
@@ -71,6 +104,11 @@ class ActivityLog(Base):
     action = Column(String)
     details = Column(String, nullable=True)
     user = relationship("User", back_populates="activity_logs")
+    __table_args__ = (
+        Index("ix_activity_logs_timestamp_id", "timestamp", "id"),
+        Index("ix_activity_logs_action_timestamp", "action", "timestamp"),
+        Index("ix_activity_logs_user_id", "user_id"),
+    )
 
 class Official(Base):
     __tablename__ = "officials"
@@ -80,4 +118,49 @@ class Official(Base):
     position = Column(String, nullable=False)
     photo_url = Column(String, nullable=True)
     bio = Column(Text, nullable=True) 
-    contributions = Column(Text, nullable=True) 
\ No newline at end of file
+    contributions = Column(Text, nullable=True)
+    photo_variants = relationship(
+        "ImageVariant",
+        primaryjoin="foreign(ImageVariant.source_url) == Official.photo_url",
+        order_by="ImageVariant.width",
+        viewonly=True,
+    )
+
+class ImageVariant(Base):
+    """A resized WebP copy of an uploaded image, looked up by the original's public URL."""
+    __tablename__ = "image_variants"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_url = Column(String, index=True, nullable=False)
+    name = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+
+class ContentVersion(Base):
+    """A version counter per cached content namespace, bumped in the same transaction as each write."""
+    __tablename__ = "content_versions"
+
+    namespace = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class MediaBlob(Base):
+    """
+    An uploaded file, stored once under its content hash. ref_count is the
+    number of post, media and official rows using its URL.
+    """
+    __tablename__ = "media_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)
+    url = Column(String, unique=True, index=True, nullable=False)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+    __table_args__ = (
+        # Garbage collection looks for unreferenced blobs unused for a while
+        Index("ix_media_blobs_ref_count_last_used_at", "ref_count", "last_used_at"),
+    )
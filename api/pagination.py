@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+# Header carrying the opaque cursor for the next page of a keyset-paginated list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encodes a (timestamp, id) position into an opaque URL-safe token."""
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Decodes a token produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+def parse_cursor(cursor: Optional[str]) -> Optional[Cursor]:
+    """Decodes an optional pagination cursor query parameter, rejecting malformed ones with a 400."""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def apply_keyset(query, timestamp_column, id_column, cursor: Optional[Cursor], descending: bool = True):
+    """Orders a query by (timestamp, id) and seeks past the cursor position, if any."""
+    if cursor is not None:
+        position = tuple_(timestamp_column, id_column)
+        if descending:
+            query = query.filter(position < tuple_(*cursor))
+        else:
+            query = query.filter(position > tuple_(*cursor))
+    if descending:
+        return query.order_by(timestamp_column.desc(), id_column.desc())
+    return query.order_by(timestamp_column.asc(), id_column.asc())
+
+
+def next_cursor(items: Sequence, timestamp_attr: str, limit: int) -> Optional[str]:
+    """Returns the cursor for the page after ``items``, or None if this was the last page."""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, timestamp_attr), last.id)
+
+
+def with_next_cursor(headers: dict, items: Sequence, timestamp_attr: str, limit: int) -> dict:
+    """Returns a copy of ``headers`` with the next page's cursor added, if there is a next page."""
+    headers = dict(headers)
+    page_cursor = next_cursor(items, timestamp_attr, limit)
+    if page_cursor:
+        headers[NEXT_CURSOR_HEADER] = page_cursor
+    return headers
@@ -0,0 +1,121 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics:
+    """Counters describing how requests wait for and use database connections."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.connections_opened = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def attach(self, pool: Pool):
+        """Registers the pool event listeners that keep these counters up to date."""
+
+        @event.listens_for(pool, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            with self._lock:
+                self.connections_opened += 1
+                # A new connection beyond pool_size means the pool had to overflow
+                if isinstance(pool, QueuePool) and pool.overflow() > 0:
+                    self.overflow_events += 1
+
+        @event.listens_for(pool, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.checkouts += 1
+                self.in_use += 1
+                self.max_in_use = max(self.max_in_use, self.in_use)
+
+        @event.listens_for(pool, "checkin")
+        def on_checkin(dbapi_connection, connection_record):
+            with self._lock:
+                self.in_use = max(self.in_use - 1, 0)
+
+        @event.listens_for(pool, "invalidate")
+        def on_invalidate(dbapi_connection, connection_record, exception):
+            with self._lock:
+                self.invalidations += 1
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            waited = self.checkouts or 1
+            stats = {
+                "pool_class": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "connections_opened": self.connections_opened,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "invalidations": self.invalidations,
+                "avg_checkout_wait_ms": round(self.total_wait / waited * 1000, 3),
+                "max_checkout_wait_ms": round(self.max_wait * 1000, 3),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return stats
+
+
+class _TimedCheckoutMixin:
+    # Times how long a checkout waits for a free connection (or opens a new
+    # one); SQLAlchemy has no public event that fires before the wait starts.
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return record
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine, metrics: PoolMetrics) -> PoolMetrics:
+    """Connects a metrics collector to an engine's (or async engine's) pool."""
+    pool = getattr(engine, "sync_engine", engine).pool
+    if isinstance(pool, _TimedCheckoutMixin):
+        pool.metrics = metrics
+    metrics.attach(pool)
+    return metrics
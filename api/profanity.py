@@ -0,0 +1,159 @@
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+class ProfanityMatch(NamedTuple):
+    start: int
+    end: int
+    word: str
+
+
+def _is_word_char(ch: str) -> bool:
+    """Mirrors the regex definition of a word character used by \\b."""
+    return ch.isalnum() or ch == "_"
+
+
+def _lower_char(ch: str) -> str:
+    # Some characters lowercase to more than one code point; keep those as-is
+    # so that match positions always line up with the original text.
+    lowered = ch.lower()
+    return lowered if len(lowered) == 1 else ch
+
+
+class _Automaton:
+    """An Aho-Corasick automaton over a fixed set of lowercase words."""
+
+    def __init__(self, words):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[str, ...]] = [()]
+
+        for word in words:
+            state = 0
+            for ch in word:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = next_state
+            self.output[state] = self.output[state] + (word,)
+
+        # Breadth-first pass to fill in failure links and merge outputs
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def scan(self, text: str, first_only: bool = False) -> List[ProfanityMatch]:
+        matches: List[ProfanityMatch] = []
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        length = len(text)
+        for index, raw_ch in enumerate(text):
+            ch = _lower_char(raw_ch)
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not output[state]:
+                continue
+            end = index + 1
+            for word in output[state]:
+                start = end - len(word)
+                if not _has_boundary(text, start, length) or not _has_boundary(text, end, length):
+                    continue
+                matches.append(ProfanityMatch(start, end, text[start:end]))
+                if first_only:
+                    return matches
+        return matches
+
+
+def _has_boundary(text: str, index: int, length: int) -> bool:
+    """Equivalent of a regex \\b assertion at ``index``."""
+    before = index > 0 and _is_word_char(text[index - 1])
+    after = index < length and _is_word_char(text[index])
+    return before != after
+
+
+class ProfanityMatcher:
+    """
+    Whole-word, case-insensitive profanity matcher backed by a word list file.
+
+    The automaton is built once and swapped atomically on reload, so readers
+    never see a half-built matcher and never need to take a lock.
+    """
+
+    def __init__(self, file_path: str, lazy: bool = False):
+        self.file_path = file_path
+        self._automaton = _Automaton(())
+        self._words: frozenset = frozenset()
+        self._mtime: Optional[float] = None
+        self._loaded = False
+        self._reload_lock = threading.Lock()
+        if not lazy:
+            self.reload()
+
+    def _ensure_loaded(self):
+        # A lazy matcher reads its file on first use; racing first callers just load it twice
+        if not self._loaded:
+            self.reload()
+
+    @property
+    def words(self) -> frozenset:
+        self._ensure_loaded()
+        return self._words
+
+    def _read_words(self) -> frozenset:
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                return frozenset(word.strip().lower() for word in f if word.strip())
+        except FileNotFoundError:
+            print(f"Warning: swearwords.txt not found at {self.file_path}. No profanity filtering will be applied.")
+            return frozenset()
+
+    def reload(self) -> int:
+        """Rebuilds the automaton from the word list file and returns the word count."""
+        with self._reload_lock:
+            try:
+                mtime = os.path.getmtime(self.file_path)
+            except OSError:
+                mtime = None
+            words = self._read_words()
+            automaton = _Automaton(sorted(words))
+            self._automaton, self._words, self._mtime = automaton, words, mtime
+            self._loaded = True
+            return len(words)
+
+    def reload_if_changed(self) -> bool:
+        """Reloads the word list only if the file was modified since the last load."""
+        try:
+            mtime = os.path.getmtime(self.file_path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self.reload()
+        return True
+
+    def find_matches(self, text: str) -> List[ProfanityMatch]:
+        """Returns every inappropriate word found in the text with its position."""
+        self._ensure_loaded()
+        if not text or not self._words:
+            return []
+        return self._automaton.scan(text)
+
+    def contains_match(self, text: str) -> bool:
+        """Checks if the text contains at least one inappropriate word."""
+        self._ensure_loaded()
+        if not text or not self._words:
+            return False
+        return bool(self._automaton.scan(text, first_only=True))
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, TypeAdapter
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 
 class RequestStatus(str, Enum):
@@ -42,9 +42,18 @@ class MediaBase(BaseModel):
 class MediaCreate(MediaBase):
     pass
 
+class ImageVariant(BaseModel):
+    name: str
+    url: str
+    width: int
+    height: int
+    class Config:
+        from_attributes = True
+
 class Media(MediaBase):
     id: int
     post_id: int
+    variants: List[ImageVariant] = []
     class Config:
         from_attributes = True
 
@@ -80,11 +89,39 @@ class Post(PostBase):
     created_at: datetime
     author: User
     primary_image_url: Optional[str] = None
+    primary_image_variants: List[ImageVariant] = []
     comments: List[Comment] = []
     media: List[Media] = []
     class Config:
         from_attributes = True
 
+class PostAuthor(BaseModel):
+    id: int
+    username: str
+    display_name: Optional[str] = None
+    class Config:
+        from_attributes = True
+
+class PostSummary(PostBase):
+    id: int
+    created_at: datetime
+    author: PostAuthor
+    primary_image_url: Optional[str] = None
+    primary_image_variants: List[ImageVariant] = []
+    media: List[Media] = []
+    comment_count: int = 0
+    class Config:
+        from_attributes = True
+
+class PostDetail(PostSummary):
+    comments: List[Comment] = []
+
+class PostSearchResult(PostSummary):
+    rank: float
+    # Title and content excerpt as HTML-escaped text with matches wrapped in <mark></mark>
+    title_highlight: str
+    snippet: Optional[str] = None
+
 class DocumentRequestCreate(BaseModel):
     requester_name: str
     requester_age: int
@@ -117,6 +154,14 @@ class DocumentRequest(BaseModel):
     class Config:
         from_attributes = True
 
+class DocumentRequestSearchResult(DocumentRequest):
+    # How closely the name or address matched the query, from 0 to 1
+    similarity: float
+
+class DocumentRequestSummary(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+
 class ActivityLog(BaseModel):
     id: int
     timestamp: datetime
@@ -146,6 +191,54 @@ class OfficialUpdate(BaseModel):
 
 class Official(OfficialBase):
     id: int
+    photo_variants: List[ImageVariant] = []
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProfanityMatch(BaseModel):
+    start: int
+    end: int
+    word: str
+
+class ProfanityCheckRequest(BaseModel):
+    text: str
+
+class ProfanityCheckResult(BaseModel):
+    is_inappropriate: bool
+    matches: List[ProfanityMatch] = []
+
+class SwearWordsReloadResult(BaseModel):
+    word_count: int
+
+class CommentRescanRequest(BaseModel):
+    post_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    unflag_clean: bool = False
+
+class CommentRescanResult(BaseModel):
+    scanned: int = 0
+    flagged: int = 0
+    unflagged: int = 0
+    queued: bool = False
+
+class UploadUrlBatchRequest(BaseModel):
+    post_folder: str
+    file_names: List[str] = Field(..., min_length=1, max_length=50)
+
+class UploadUrl(BaseModel):
+    file_name: str
+    signed_url: str
+    public_url: str
+
+def post_detail(db_post, comments) -> PostDetail:
+    """Combines a post loaded with its comment count and a page of its comments."""
+    summary = PostSummary.model_validate(db_post)
+    return PostDetail.model_validate({**summary.model_dump(), "comments": comments}, from_attributes=True)
+
+# Adapters used to serialize cached public responses in one pass
+PostSummaryList = TypeAdapter(List[PostSummary])
+PostDetailAdapter = TypeAdapter(PostDetail)
+PostSearchResultList = TypeAdapter(List[PostSearchResult])
+OfficialList = TypeAdapter(List[Official])
@@ -0,0 +1,115 @@
+import html
+import re
+from difflib import SequenceMatcher
+from typing import List, Optional
+
+from sqlalchemy import literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from .settings import SEARCH_TEXT_CONFIG
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+SNIPPET_LENGTH = 200
+MAX_QUERY_TERMS = 8
+
+# ts_headline marks matches with these private-use characters; its output is
+# HTML-escaped first and only then are they swapped for the real markers, so
+# post text can never inject markup of its own
+HEADLINE_START = "\ue000"
+HEADLINE_STOP = "\ue001"
+
+# Options for Postgres' ts_headline: whole titles, short fragments of the content
+TITLE_HEADLINE_OPTIONS = f'HighlightAll=true, StartSel="{HEADLINE_START}", StopSel="{HEADLINE_STOP}"'
+SNIPPET_HEADLINE_OPTIONS = (
+    f'StartSel="{HEADLINE_START}", StopSel="{HEADLINE_STOP}", '
+    'MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" … "'
+)
+
+if not re.fullmatch(r"[a-z_]+", SEARCH_TEXT_CONFIG):
+    raise RuntimeError(f"Invalid SEARCH_TEXT_CONFIG '{SEARCH_TEXT_CONFIG}'.")
+
+# Generated column maintained by Postgres itself; title matches weigh more than content
+# matches. It is not mapped on models.Post because SQLite cannot create it.
+search_vector = literal_column("posts.search_vector", type_=TSVECTOR)
+
+SEARCH_VECTOR_DDL = [
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_TEXT_CONFIG}', coalesce(content, '')), 'B')"
+    ") STORED",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+
+
+# Trigram indexes for fuzzy lookups of document requests by requester name and address
+TRIGRAM_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_requests_requester_name_trgm "
+    "ON document_requests USING GIN (requester_name gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_requests_address_trgm "
+    "ON document_requests USING GIN (address gin_trgm_ops)",
+]
+
+
+def query_terms(query: str) -> List[str]:
+    """Splits a search box query into lowercase words for the LIKE fallback."""
+    words = re.findall(r"\w+", query.lower())
+    return list(dict.fromkeys(words))[:MAX_QUERY_TERMS]
+
+
+def _terms_pattern(terms: List[str]) -> re.Pattern:
+    # Longest first, so a term never highlights only part of a longer one
+    return re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+
+def highlight(text: Optional[str], terms: List[str]) -> Optional[str]:
+    """HTML-escapes the text and wraps every occurrence of the terms in highlight markers."""
+    if not text:
+        return text
+    if not terms:
+        return html.escape(text)
+    parts, position = [], 0
+    for match in _terms_pattern(terms).finditer(text):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"{HIGHLIGHT_START}{html.escape(match.group(0))}{HIGHLIGHT_STOP}")
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return "".join(parts)
+
+
+def headline_html(headline: Optional[str]) -> Optional[str]:
+    """Turns ts_headline output (marked with the sentinels) into escaped HTML with highlight markers."""
+    if headline is None:
+        return None
+    return html.escape(headline).replace(HEADLINE_START, HIGHLIGHT_START).replace(HEADLINE_STOP, HIGHLIGHT_STOP)
+
+
+def snippet(text: Optional[str], terms: List[str], length: int = SNIPPET_LENGTH) -> Optional[str]:
+    """Returns an HTML-escaped, highlighted excerpt of the text around the first matching term."""
+    if not text:
+        return text
+    match = _terms_pattern(terms).search(text) if terms else None
+    start = max(0, match.start() - length // 4) if match else 0
+    if start > 0:
+        # Don't start in the middle of a word
+        space = text.find(" ", start)
+        start = space + 1 if 0 <= space < (match.start() if match else start + length) else start
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+    excerpt = text[start:end].strip()
+    return ("… " if start > 0 else "") + highlight(excerpt, terms) + (" …" if end < len(text) else "")
+
+
+def similarity(query: str, text: Optional[str]) -> float:
+    """A 0-1 closeness score of the query to its best matching stretch of the text (LIKE fallback)."""
+    if not text:
+        return 0.0
+    query, text = query.lower(), text.lower()
+    if query in text:
+        return 1.0
+    matcher = SequenceMatcher(None, query, text)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+    return round(matched / len(query), 3) if query else 0.0
@@ -1,16 +1,77 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from .settings import SECRET_KEY, ALGORITHM
+from .settings import SECRET_KEY, ALGORITHM, PASSWORD_HASH_MAX_QUEUE, PASSWORD_HASH_WORKERS
 
 # This is the same password context from crud.py
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+class PasswordHasherBusy(Exception):
+    """Raised when too many password checks are already waiting for the hashing executor."""
+
+# bcrypt is deliberately slow, so logins run on their own small executor
+# instead of the threadpool that serves every other request.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_stats_lock = threading.Lock()
+_password_stats = {"queued": 0, "running": 0, "completed": 0, "rejected": 0, "rehashed": 0}
+
+# A real bcrypt hash (same cost as new hashes) that unknown usernames are checked
+# against, so a failed login costs the same whether or not the user exists
+_DUMMY_HASH = "$2b$12$.Xhb6hcJbwg511N33BuKiuOUpiLWPnGPXhWPgDKkRcxXv8EfMEmpu"
+
 def verify_password(plain_password, hashed_password):
     """Verifies a plain password against a hashed one."""
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password and returns (is_valid, new_hash). new_hash is set when the
+    stored hash uses outdated settings and should be replaced. A missing hash
+    (unknown user) is checked against a dummy hash so it costs as much as a real one.
+    """
+    if hashed_password is None:
+        pwd_context.verify(plain_password, _DUMMY_HASH)
+        return False, None
+    verified, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    if verified and new_hash:
+        with _password_stats_lock:
+            _password_stats["rehashed"] += 1
+    return verified, new_hash
+
+def _run_password_check(plain_password: str, hashed_password: Optional[str]):
+    with _password_stats_lock:
+        _password_stats["queued"] -= 1
+        _password_stats["running"] += 1
+    try:
+        return verify_and_update_password(plain_password, hashed_password)
+    finally:
+        with _password_stats_lock:
+            _password_stats["running"] -= 1
+            _password_stats["completed"] += 1
+
+async def verify_and_update_password_offloaded(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Runs verify_and_update_password on the bounded password executor."""
+    with _password_stats_lock:
+        if _password_stats["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+            _password_stats["rejected"] += 1
+            raise PasswordHasherBusy()
+        _password_stats["queued"] += 1
+    future = _password_executor.submit(_run_password_check, plain_password, hashed_password)
+    return await asyncio.wrap_future(future)
+
+def password_hashing_stats() -> dict:
+    with _password_stats_lock:
+        return {
+            **_password_stats,
+            "queue_depth": _password_stats["queued"],
+            "workers": PASSWORD_HASH_WORKERS,
+            "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        }
+
 def get_password_hash(password):
     """Hashes a plain password."""
     return pwd_context.hash(password)
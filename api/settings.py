@@ -10,9 +10,97 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_BUCKET_NAME = os.getenv("SUPABASE_BUCKET_NAME", "post-media")
 
+# Connection pool. DB_POOL_MODE "queue" keeps a pool of connections per worker;
+# "null" opens a connection per checkout, which is what a transaction-mode
+# pooler (e.g. Supabase on port 6543) expects, and also disables asyncpg's
+# prepared statement cache that such poolers cannot support.
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Serve the public endpoints through an asyncpg-backed AsyncSession instead of
+# the synchronous psycopg2 engine
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+# Startup. The schema is set up at deploy time with `python -m api.migrations`,
+# so instances start without running DDL. Set DB_CREATE_SCHEMA=true in local
+# development to have each startup do the same. DB_POOL_WARMUP connections are
+# opened in the background after startup, and /ready reports ready once they are.
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "false").lower() in ("1", "true", "yes")
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", "2"))
+
+SWEAR_WORDS_PATH = os.getenv("SWEAR_WORDS_PATH", "src/assets/swearwords.txt")
+
+# Postgres text search configuration used for post search. "simple" only
+# lowercases words, which suits announcements written in mixed English and
+# Filipino; changing it requires recreating posts.search_vector.
+SEARCH_TEXT_CONFIG = os.getenv("SEARCH_TEXT_CONFIG", "simple")
+
+# Fuzzy document request lookup (pg_trgm): the lowest word similarity, from 0
+# to 1, between the query and a requester's name or address that still matches
+DOCUMENT_SEARCH_MIN_SIMILARITY = float(os.getenv("DOCUMENT_SEARCH_MIN_SIMILARITY", "0.4"))
+
+# Media uploads are streamed to STORAGE_BACKEND "supabase", or "local" (files
+# under LOCAL_STORAGE_DIR, served at /storage) as a stand-in for tests.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", "storage")
+LOCAL_STORAGE_BASE_URL = os.getenv("LOCAL_STORAGE_BASE_URL", "http://localhost:8000/storage")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+STORAGE_HTTP_MAX_CONNECTIONS = int(os.getenv("STORAGE_HTTP_MAX_CONNECTIONS", "20"))
+# Uploads are stored once per content hash. Files no post or official uses any
+# more are deleted, but only once unused for this long, so that a fresh upload
+# survives until the form using it is saved.
+MEDIA_BLOB_GC_GRACE_SECONDS = float(os.getenv("MEDIA_BLOB_GC_GRACE_SECONDS", "3600"))
+
+# Uploaded images get WebP copies at these widths (name:width), rendered by a
+# process pool with IMAGE_PROCESS_WORKERS processes. Requires Pillow.
+IMAGE_VARIANT_WIDTHS = {
+    name: int(width)
+    for name, width in (
+        item.split(":") for item in os.getenv("IMAGE_VARIANT_WIDTHS", "thumb:320,medium:960,large:1920").split(",") if item
+    )
+}
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", "2"))
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+
+# Response cache for public read endpoints and token lookups.
+# CACHE_BACKEND is "memory" (per worker) or "redis" (shared by all workers).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_CACHE_PREFIX = os.getenv("REDIS_CACHE_PREFIX", "skonnect:cache")
+# A Redis call that takes longer than this fails and counts as a cache miss
+REDIS_SOCKET_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_TIMEOUT_SECONDS", "0.5"))
+PUBLIC_CACHE_TTL_SECONDS = float(os.getenv("PUBLIC_CACHE_TTL_SECONDS", "30"))
+PUBLIC_CACHE_MAX_ENTRIES = int(os.getenv("PUBLIC_CACHE_MAX_ENTRIES", "512"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
 
 SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key_that_should_be_changed")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Logins verify bcrypt hashes on a dedicated executor with this many threads;
+# attempts beyond PASSWORD_HASH_MAX_QUEUE waiting checks are turned away with a 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Document request status streams (SSE) and live comment streams (WebSocket).
+# EVENTS_BACKEND "memory" only reaches streams held by the worker that made the
+# change; "postgres" fans changes out to every worker with LISTEN/NOTIFY (needs
+# a direct or session-mode connection).
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory").lower()
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", "1000"))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "1000"))
+# Comment events queued per WebSocket before a client that cannot keep up is disconnected
+WS_COMMENT_QUEUE_SIZE = int(os.getenv("WS_COMMENT_QUEUE_SIZE", "32"))
 
+# Activity log entries are buffered and written in batches by a background thread
+ACTIVITY_LOG_FLUSH_SECONDS = float(os.getenv("ACTIVITY_LOG_FLUSH_SECONDS", "1"))
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "100"))
+ACTIVITY_LOG_MAX_BUFFER = int(os.getenv("ACTIVITY_LOG_MAX_BUFFER", "10000"))
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import uuid
+from urllib.parse import parse_qs, urlparse
+from typing import AsyncIterator, List, NamedTuple, Optional
+
+import httpx
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from .settings import (
+    LOCAL_STORAGE_BASE_URL,
+    LOCAL_STORAGE_DIR,
+    MAX_UPLOAD_BYTES,
+    STORAGE_BACKEND,
+    STORAGE_HTTP_MAX_CONNECTIONS,
+    SUPABASE_BUCKET_NAME,
+    SUPABASE_KEY,
+    SUPABASE_URL,
+    UPLOAD_CHUNK_SIZE,
+)
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload turns out to be bigger than MAX_UPLOAD_BYTES."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File is larger than the {limit // (1024 * 1024)} MB upload limit.")
+        self.limit = limit
+
+
+class StoredFile(NamedTuple):
+    path: str
+    url: str
+    is_new: bool = True
+
+
+async def iter_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yields an upload in chunks, raising UploadTooLarge as soon as it passes max_bytes."""
+    received = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        received += len(chunk)
+        if received > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        yield chunk
+
+
+class SupabaseStorage:
+    """
+    Uploads to a Supabase storage bucket through its REST API.
+
+    Bodies are streamed chunk by chunk from the upload, and a single
+    httpx.AsyncClient is shared so connections to Supabase are reused
+    across requests instead of being opened per upload.
+    """
+
+    def __init__(self, url: str, key: str, bucket: str, max_connections: int = 20):
+        self.url = url.rstrip("/") if url else url
+        self.key = key
+        self.bucket = bucket
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it belongs to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.key}", "apikey": self.key},
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                timeout=httpx.Timeout(30.0, write=None),  # Writes of large files may legitimately take a while
+            )
+        return self._client
+
+    def public_url(self, path: str) -> str:
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{path}"
+
+    def path_for_url(self, url: str) -> Optional[str]:
+        prefix = self.public_url("")
+        return url[len(prefix):] if url.startswith(prefix) else None
+
+    async def upload(self, path: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None, size: Optional[int] = None) -> str:
+        # Paths are derived from the content, so overwriting an object only
+        # ever rewrites the same bytes (e.g. two identical uploads racing)
+        headers = {"Content-Type": content_type or "application/octet-stream", "x-upsert": "true", "cache-control": "max-age=3600"}
+        if size is not None:
+            # Send a Content-Length instead of a chunked body when the size is known up front
+            headers["Content-Length"] = str(size)
+        response = await self.client.post(
+            f"{self.url}/storage/v1/object/{self.bucket}/{path}", content=chunks, headers=headers
+        )
+        if response.status_code >= 400:
+            raise RuntimeError(f"Storage upload failed ({response.status_code}): {response.text}")
+        return self.public_url(path)
+
+    async def create_signed_upload_url(self, path: str) -> dict:
+        """Asks storage for a URL the browser can upload this one path to directly."""
+        response = await self.client.post(f"{self.url}/storage/v1/object/upload/sign/{self.bucket}/{path}")
+        if response.status_code >= 400:
+            raise RuntimeError(f"Could not sign upload URL for '{path}' ({response.status_code}): {response.text}")
+        signed_url = f"{self.url}/storage/v1/{response.json()['url'].lstrip('/')}"
+        if not parse_qs(urlparse(signed_url).query).get("token"):
+            raise RuntimeError(f"Storage returned no upload token for '{path}'")
+        return {"signed_url": signed_url, "public_url": self.public_url(path)}
+
+    async def delete(self, paths: List[str]):
+        response = await self.client.request("DELETE", f"{self.url}/storage/v1/object/{self.bucket}", json={"prefixes": paths})
+        if response.status_code >= 400:
+            raise RuntimeError(f"Storage delete failed ({response.status_code}): {response.text}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalStorage:
+    """Stores uploads on the local filesystem; a stand-in for Supabase in tests and development."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def public_url(self, path: str) -> str:
+        return f"{self.base_url}/{path}"
+
+    def path_for_url(self, url: str) -> Optional[str]:
+        prefix = self.public_url("")
+        return url[len(prefix):] if url.startswith(prefix) else None
+
+    def _target(self, path: str) -> str:
+        return os.path.join(self.root, *path.split("/"))
+
+    async def upload(self, path: str, chunks: AsyncIterator[bytes], content_type: Optional[str] = None, size: Optional[int] = None) -> str:
+        target = self._target(path)
+        await run_in_threadpool(os.makedirs, os.path.dirname(target), exist_ok=True)
+        # Write to a temporary name and rename, so readers never see a partial file
+        partial = f"{target}.{uuid.uuid4().hex}.part"
+        out = await run_in_threadpool(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                await run_in_threadpool(out.write, chunk)
+        except BaseException:
+            out.close()
+            os.remove(partial)
+            raise
+        out.close()
+        await run_in_threadpool(os.replace, partial, target)
+        return self.public_url(path)
+
+    async def create_signed_upload_url(self, path: str) -> dict:
+        raise RuntimeError("Signed upload URLs need STORAGE_BACKEND=supabase.")
+
+    async def delete(self, paths: List[str]):
+        for path in paths:
+            try:
+                await run_in_threadpool(os.remove, self._target(path))
+            except FileNotFoundError:
+                pass
+
+    async def close(self):
+        pass
+
+
+def create_storage_backend():
+    """Builds the storage backend selected by the STORAGE_BACKEND setting."""
+    if STORAGE_BACKEND == "supabase":
+        return SupabaseStorage(SUPABASE_URL, SUPABASE_KEY, SUPABASE_BUCKET_NAME, max_connections=STORAGE_HTTP_MAX_CONNECTIONS)
+    if STORAGE_BACKEND == "local":
+        return LocalStorage(LOCAL_STORAGE_DIR, LOCAL_STORAGE_BASE_URL)
+    raise RuntimeError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Use 'supabase' or 'local'.")
+
+
+backend = create_storage_backend()
+
+
+async def save_bytes(path: str, data: bytes, content_type: str) -> str:
+    """Stores an in-memory file (e.g. a generated image variant) and returns its public URL."""
+
+    async def chunks():
+        yield data
+
+    return await backend.upload(path, chunks(), content_type=content_type, size=len(data))
+
+
+async def delete_urls(urls: List[str]):
+    """Removes stored files by public URL, skipping URLs that point elsewhere."""
+    paths = [path for path in (backend.path_for_url(url) for url in urls) if path]
+    if paths:
+        await backend.delete(paths)
+
+
+async def create_signed_upload_urls(paths: List[str]) -> List[dict]:
+    """Signs upload URLs for several paths concurrently over the shared connection pool."""
+    return list(await asyncio.gather(*(backend.create_signed_upload_url(path) for path in paths)))
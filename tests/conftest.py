@@ -0,0 +1,90 @@
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# Settings are read at import time, so point the app at throwaway SQLite and
+# local storage before anything from api is imported
+_tmp = tempfile.mkdtemp(prefix="skonnect-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmp, 'test.db')}")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_DIR", os.path.join(_tmp, "storage"))
+os.environ.setdefault("LOCAL_STORAGE_BASE_URL", "http://testserver/storage")
+os.environ.setdefault("CACHE_BACKEND", "memory")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from api import activity_log, cache, database, main, models
+
+
+@event.listens_for(database.engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # Postgres always does; SQLite only when asked
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    models.Base.metadata.create_all(bind=database.engine)
+    cache.public_cache.clear()
+    cache.user_cache.clear()
+    yield
+    activity_log.writer.flush()
+    models.Base.metadata.drop_all(bind=database.engine)
+    shutil.rmtree(os.environ["LOCAL_STORAGE_DIR"], ignore_errors=True)
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def admin_headers(client):
+    client.post("/register/", json={"username": "admin", "email": "admin@example.com", "password": "password123", "display_name": "Admin"})
+    response = client.post("/token", data={"username": "admin", "password": "password123"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    @property
+    def selects(self):
+        return [statement for statement in self.statements if statement.lstrip().upper().startswith("SELECT")]
+
+    def __call__(self, conn, cursor, statement, *args):
+        # The activity log writer flushes from its own thread whenever it likes
+        if not statement.startswith("INSERT INTO activity_logs"):
+            self.statements.append(statement)
+
+
+@pytest.fixture
+def count_queries():
+    """Counts the SQL statements run inside a `with count_queries() as queries:` block."""
+
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+        event.listen(database.engine, "before_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            event.remove(database.engine, "before_cursor_execute", counter)
+
+    return counting
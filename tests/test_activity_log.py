@@ -0,0 +1,51 @@
+from api import database, models
+from api.activity_log import ActivityLogWriter
+
+
+def _writer(**kwargs):
+    return ActivityLogWriter(database.SessionLocal, **kwargs)
+
+
+def _seed_user(db):
+    user = models.User(username="admin", email="admin@example.com", display_name="Admin", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def test_bad_entry_is_dropped_without_holding_up_the_batch(db):
+    user_id = _seed_user(db)
+    writer = _writer()
+    writer.record(user_id, "USER_LOGIN")
+    writer.record(user_id + 1, "USER_LOGIN")  # The user was deleted meanwhile; trips the foreign key
+    writer.record(user_id, "CREATED_POST", "Post ID: 1")
+
+    assert writer.flush() == 2
+
+    assert [log.action for log in db.query(models.ActivityLog).order_by(models.ActivityLog.id)] == ["USER_LOGIN", "CREATED_POST"]
+    assert writer.stats() == {"buffered": 0, "written": 2, "failed_flushes": 0, "rejected": 1, "dropped": 0}
+
+
+def test_entries_are_kept_while_the_database_is_unavailable(db):
+    user_id = _seed_user(db)
+    writer = _writer()
+    writer.record(user_id, "USER_LOGIN")
+    models.ActivityLog.__table__.drop(bind=database.engine)
+
+    assert writer.flush() == 0
+    assert writer.stats()["buffered"] == 1
+    assert writer.stats()["failed_flushes"] == 1
+
+    models.ActivityLog.__table__.create(bind=database.engine)
+    assert writer.flush() == 1
+    assert db.query(models.ActivityLog).count() == 1
+
+
+def test_full_buffer_keeps_the_newest_entries():
+    writer = _writer(max_buffer=3)
+    writer._thread = object()  # Keeps record() from starting the background writer
+    for i in range(5):
+        writer.record(1, f"ACTION_{i}")
+
+    assert [entry["action"] for entry in writer._buffer] == ["ACTION_2", "ACTION_3", "ACTION_4"]
+    assert writer.dropped == 2
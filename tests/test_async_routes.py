@@ -0,0 +1,80 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import async_routes, cache, database
+from api.pagination import NEXT_CURSOR_HEADER
+
+# The async endpoints normally run on asyncpg (DB_ASYNC=true); here they run on
+# aiosqlite against the same database as the sync app, so both can be compared
+
+
+@pytest.fixture
+def async_client(monkeypatch):
+    async_engine = database.create_async_engine_for(database.DATABASE_URL)
+    monkeypatch.setattr(async_routes, "AsyncSessionLocal", database.async_session_factory(async_engine))
+    app = FastAPI()
+    app.include_router(async_routes.router)
+    with TestClient(app) as client:
+        yield client
+        client.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def content(client, admin_headers):
+    post_ids = [
+        client.post("/admin/posts/", json={"title": title, "media": [{"url": f"https://cdn.example.com/{title}.jpg", "media_type": "image"}]}, headers=admin_headers).json()["id"]
+        for title in ("Clean-up drive", "Vaccination schedule")
+    ]
+    comment_ids = [client.post(f"/posts/{post_ids[0]}/comments/", json={"content": f"Comment {i}"}).json()["id"] for i in range(3)]
+    client.patch(f"/admin/comments/{comment_ids[0]}/flag", headers=admin_headers)
+    client.post("/admin/officials/", json={"name": "Juan Dela Cruz", "position": "Chairman"}, headers=admin_headers)
+    token = client.post("/document-requests/", json={
+        "requester_name": "Maria Santos", "requester_age": 30, "date_of_birth": "1995-01-01",
+        "address": "Purok 1", "document_type": "Barangay Clearance", "purpose": "Employment",
+    }).json()["request_token"]
+    return {"post_id": post_ids[0], "token": token}
+
+
+def _get_uncached(client, path, **kwargs):
+    cache.public_cache.clear()  # Make each request reach its own database path
+    return client.get(path, **kwargs)
+
+
+@pytest.mark.parametrize("path", [
+    "/posts/",
+    "/posts/?limit=1",
+    "/posts/{post_id}?comment_limit=1",
+    "/posts/{post_id}?comment_skip=1&comment_limit=5",
+    "/officials/",
+    "/document-requests/status/{token}",
+    "/posts/999",
+    "/posts/?cursor=not-a-cursor",
+])
+def test_async_routes_match_sync_routes(client, async_client, content, path):
+    path = path.format(**content)
+
+    sync_response = _get_uncached(client, path)
+    async_response = _get_uncached(async_client, path)
+
+    assert async_response.status_code == sync_response.status_code
+    assert async_response.json() == sync_response.json()
+    for header in ("ETag", "Last-Modified", NEXT_CURSOR_HEADER):
+        assert async_response.headers.get(header) == sync_response.headers.get(header)
+
+
+def test_async_routes_answer_conditional_requests(async_client, content):
+    etag = async_client.get("/posts/").headers["ETag"]
+
+    assert _get_uncached(async_client, "/posts/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_async_comment_creation(client, async_client, content):
+    response = async_client.post(f"/posts/{content['post_id']}/comments/", json={"content": "See you there"})
+
+    assert response.status_code == 201
+    assert response.json()["is_inappropriate"] is False
+    detail = client.get(f"/posts/{content['post_id']}").json()
+    assert detail["comment_count"] == 3
+    assert response.json()["id"] in {comment["id"] for comment in detail["comments"]}
+    assert async_client.post("/posts/999/comments/", json={"content": "Hello"}).status_code == 404
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from api import crud, events
+from api.profanity import ProfanityMatcher
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    comment_hub = events.CommentHub(max_connections=10, queue_size=8)
+    monkeypatch.setattr(events, "comment_hub", comment_hub)
+    return comment_hub
+
+
+@pytest.fixture
+def post_id(client, admin_headers, tmp_path, monkeypatch):
+    words_file = tmp_path / "swearwords.txt"
+    words_file.write_text("darn\n", encoding="utf-8")
+    monkeypatch.setattr(crud, "profanity_matcher", ProfanityMatcher(str(words_file)))
+    return client.post("/admin/posts/", json={"title": "Clean-up drive"}, headers=admin_headers).json()["id"]
+
+
+def _comment(client, post_id, content):
+    return client.post(f"/posts/{post_id}/comments/", json={"content": content}).json()["id"]
+
+
+def test_viewers_see_visible_comments_come_and_go(client, admin_headers, hub, post_id):
+    with client.websocket_connect(f"/ws/posts/{post_id}/comments") as websocket:
+        _comment(client, post_id, "Oh darn")  # Flagged on arrival, so viewers never see it
+        comment_id = _comment(client, post_id, "See you there")
+        added = websocket.receive_json()
+        client.patch(f"/admin/comments/{comment_id}/flag", headers=admin_headers)
+        removed = websocket.receive_json()
+        client.patch(f"/admin/comments/{comment_id}/unflag", headers=admin_headers)
+        restored = websocket.receive_json()
+
+    assert (added["type"], added["comment"]["id"], added["comment"]["content"]) == ("comment.added", comment_id, "See you there")
+    assert removed == {"type": "comment.removed", "post_id": post_id, "comment_id": comment_id}
+    assert (restored["type"], restored["comment"]["id"]) == ("comment.added", comment_id)
+    assert hub.stats()["connections"] == 0
+
+
+def test_moderators_see_flagged_comments_too(client, admin_headers, hub, post_id):
+    token = admin_headers["Authorization"].split()[1]
+
+    with client.websocket_connect(f"/ws/admin/comments?token={token}") as websocket:
+        comment_id = _comment(client, post_id, "Oh darn")
+        created = websocket.receive_json()
+
+    assert (created["type"], created["comment"]["id"], created["comment"]["is_inappropriate"]) == ("comment.created", comment_id, True)
+
+
+@pytest.mark.parametrize("path", ["/ws/posts/999/comments", "/ws/admin/comments?token=not-a-token"])
+def test_streams_refuse_unknown_posts_and_non_admins(client, hub, path):
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect(path):
+            pass
+
+    assert excinfo.value.code == 1008
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.sent.append(message)
+
+    async def receive(self):
+        await asyncio.Event().wait()  # A client that never disconnects on its own
+
+    async def close(self, code=1000, reason=None):
+        self.close_code = code
+
+
+def test_a_client_that_falls_behind_is_disconnected():
+    hub = events.CommentHub(queue_size=2)
+    websocket = FakeWebSocket()
+
+    async def fall_behind():
+        connection = hub.connect(websocket, post_id=1)
+        for comment_id in range(3):
+            hub.publish({"type": events.COMMENT_DELETED, "post_id": 1, "comment_id": comment_id})
+        await asyncio.sleep(0)  # Let the deliveries run before the client reads anything
+        await hub._send(connection)
+        hub.disconnect(connection)
+
+    asyncio.run(fall_behind())
+
+    assert websocket.sent == []  # Queued events are dropped; the client reloads instead
+    assert websocket.close_code == 1013
+    assert (hub.stats()["slow_disconnects"], hub.stats()["connections"]) == (1, 0)
+
+
+def test_connections_over_the_limit_are_turned_away():
+    hub = events.CommentHub(max_connections=0)
+    websocket = FakeWebSocket()
+
+    asyncio.run(hub.serve(websocket, post_id=1))
+
+    assert websocket.close_code == 1013
+    assert hub.stats()["connections"] == 0
@@ -0,0 +1,47 @@
+from api import crud, models
+
+
+def test_feed_etag_changes_with_posts_and_comments(client, admin_headers):
+    post_id = client.post("/admin/posts/", json={"title": "Clean-up drive"}, headers=admin_headers).json()["id"]
+    first = client.get("/posts/")
+    assert client.get("/posts/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    client.post(f"/posts/{post_id}/comments/", json={"content": "See you there"})
+    second = client.get("/posts/")
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.json()[0]["comment_count"] == 1
+
+    client.post("/admin/posts/", json={"title": "Vaccination schedule"}, headers=admin_headers)
+    third = client.get("/posts/", headers={"If-None-Match": second.headers["ETag"]})
+    assert third.status_code == 200
+    assert third.headers["ETag"] != second.headers["ETag"]
+
+
+def test_not_modified_costs_one_query(client, admin_headers, count_queries):
+    client.post("/admin/posts/", json={"title": "Clean-up drive"}, headers=admin_headers)
+    etag = client.get("/posts/").headers["ETag"]
+    crud.cache.public_cache.clear()  # Make the request reach the database
+
+    with count_queries() as queries:
+        response = client.get("/posts/", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert len(queries) == 1
+
+
+def test_comment_writes_only_bump_the_comments_version(db, count_queries):
+    user = models.User(username="admin", email="admin@example.com", display_name="Admin", hashed_password="x")
+    db.add(models.Post(title="Clean-up drive", author=user))
+    db.commit()
+    post_id = db.query(models.Post.id).scalar()
+
+    with count_queries() as queries:
+        db_comment = crud.create_comment(db, crud.schemas.CommentCreate(content="See you there"), post_id)
+        crud.mark_comment_inappropriate(db, db_comment.id, True)
+        crud.delete_comment(db, db_comment.id)
+
+    version_writes = [statement for statement in queries.statements if "content_versions" in statement]
+    assert len(version_writes) == 3
+    assert {namespace for (namespace,) in db.query(models.ContentVersion.namespace)} == {crud.COMMENTS_VERSION}
+    assert db.get(models.ContentVersion, crud.COMMENTS_VERSION).version == 3
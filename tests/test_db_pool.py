@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import NullPool
+
+from api import database
+from api.pool_metrics import InstrumentedQueuePool, PoolMetrics, instrument
+
+
+@pytest.fixture
+def make_engine(tmp_path, monkeypatch):
+    engines = []
+
+    def make(mode, **settings):
+        monkeypatch.setattr(database, "DB_POOL_MODE", mode)
+        for name, value in settings.items():
+            monkeypatch.setattr(database, name, value)
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", **database.pool_options())
+        engines.append(engine)
+        return engine, instrument(engine, PoolMetrics())
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+def _query(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+def test_null_pool_opens_a_connection_per_checkout(make_engine, monkeypatch):
+    engine, metrics = make_engine("null")
+    for _ in range(3):
+        _query(engine)
+
+    stats = metrics.snapshot(engine.pool)
+    assert isinstance(engine.pool, NullPool)
+    assert (stats["pool_class"], stats["checkouts"], stats["connections_opened"], stats["in_use"]) == ("NullPool", 3, 3, 0)
+    assert "pool_size" not in stats
+    monkeypatch.setattr(database, "DB_POOL_MODE", "null")
+    assert database.warm_up_pool() == 0
+
+
+def test_queue_pool_reuses_connections_and_counts_timeouts(make_engine):
+    engine, metrics = make_engine("queue", DB_POOL_SIZE=1, DB_MAX_OVERFLOW=0, DB_POOL_TIMEOUT=0.1)
+    for _ in range(3):
+        _query(engine)
+
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    stats = metrics.snapshot(engine.pool)
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    assert stats["connections_opened"] == 1
+    assert (stats["checkouts"], stats["max_in_use"], stats["timeouts"]) == (4, 1, 1)
+    assert (stats["pool_size"], stats["checked_out"], stats["checked_in"]) == (1, 0, 1)
+
+
+def test_unknown_pool_mode_is_rejected(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_MODE", "pgbouncer")
+
+    with pytest.raises(RuntimeError):
+        database.pool_options()
+
+
+def test_pool_metrics_endpoint_requires_an_admin(client, admin_headers):
+    assert client.get("/admin/metrics/db-pool").status_code == 401
+
+    response = client.get("/admin/metrics/db-pool", headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.json()["sync"]["checkouts"] >= 1
@@ -0,0 +1,49 @@
+REQUEST = {
+    "requester_name": "Juan Dela Cruz",
+    "requester_age": 30,
+    "date_of_birth": "1995-01-01",
+    "address": "Purok 3",
+    "document_type": "clearance",
+    "purpose": "Employment",
+}
+
+
+def test_listing_document_requests_requires_an_admin(client, admin_headers):
+    client.post("/document-requests/", json=REQUEST)
+
+    assert client.get("/admin/requests/").status_code == 401
+    response = client.get("/admin/requests/", headers=admin_headers)
+    assert response.status_code == 200
+    assert [request["requester_name"] for request in response.json()] == ["Juan Dela Cruz"]
+
+
+def test_every_admin_route_requires_authentication(client):
+    for route in client.app.routes:
+        path = getattr(route, "path", "")
+        if not path.startswith("/admin"):
+            continue
+        for method in route.methods - {"HEAD"}:
+            response = client.request(method, path.replace("{", "").replace("}", ""))
+            assert response.status_code == 401, f"{method} {path}"
+
+
+def test_search_falls_back_to_substring_matches_without_pg_trgm(client, admin_headers):
+    for name, address, document_type in [
+        ("Juan Dela Cruz", "Purok 3", "clearance"),
+        ("Pedro Juanito", "Sitio Mabini", "indigency"),
+        ("Maria Santos", "Purok 5, Zone A", "clearance"),
+        ("Jose Rizal", "Lot_7 Block 2", "clearance"),
+        ("Andres Bonifacio", "Lot 7 Block 2", "clearance"),
+    ]:
+        client.post("/document-requests/", json={**REQUEST, "requester_name": name, "address": address, "document_type": document_type})
+
+    def search(**params):
+        response = client.get("/admin/requests/search", params=params, headers=admin_headers)
+        assert response.status_code == 200, response.text
+        return [(request["requester_name"], request["similarity"]) for request in response.json()]
+
+    assert search(q="JUAN") == [("Pedro Juanito", 1.0), ("Juan Dela Cruz", 1.0)]
+    assert search(q="purok 5") == [("Maria Santos", 1.0)]  # Every word has to match
+    assert search(q="juan", document_type="clearance") == [("Juan Dela Cruz", 1.0)]
+    assert search(q="lot_7") == [("Jose Rizal", 1.0)]  # "_" matches itself, not any character
+    assert client.get("/admin/requests/search", params={"q": "juan"}).status_code == 401
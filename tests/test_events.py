@@ -0,0 +1,80 @@
+import json
+
+import pytest
+from sqlalchemy import event
+
+from api import crud, database, events, models, schemas
+
+
+@pytest.fixture
+def published(monkeypatch):
+    payloads = []
+    monkeypatch.setattr(events.comment_hub, "publish", payloads.append)
+    monkeypatch.setattr(events.broker, "publish", payloads.append)
+    return payloads
+
+
+@pytest.fixture
+def post_id(db):
+    user = models.User(username="admin", email="admin@example.com", display_name="Admin", hashed_password="x")
+    db.add(models.Post(title="Clean-up drive", author=user))
+    db.commit()
+    return db.query(models.Post.id).scalar()
+
+
+def test_events_are_published_once_after_commit(db, post_id, published):
+    db_comment = crud.create_comment(db, schemas.CommentCreate(content="See you there"), post_id)
+
+    assert [(payload["type"], payload["comment_id"]) for payload in published] == [(events.COMMENT_CREATED, db_comment.id)]
+    db.commit()
+    assert len(published) == 1
+
+
+def test_rolled_back_events_are_never_published(db, post_id, published):
+    db_comment = models.Comment(content="Draft", post_id=post_id)
+    db.add(db_comment)
+    db.flush()
+    events.notify_comment_change(db, events.COMMENT_CREATED, db_comment)
+    db.rollback()
+
+    # The session is reused for an unrelated write
+    db.add(models.Comment(content="Other", post_id=post_id))
+    db.commit()
+
+    assert published == []
+
+
+def test_events_in_a_savepoint_wait_for_the_real_commit(db, post_id, published):
+    with db.begin_nested():
+        db_comment = models.Comment(content="Nested", post_id=post_id)
+        db.add(db_comment)
+        db.flush()
+        events.notify_comment_change(db, events.COMMENT_CREATED, db_comment)
+    assert published == []
+
+    db.commit()
+    assert [payload["comment_id"] for payload in published] == [db_comment.id]
+
+
+def test_postgres_backend_notifies_inside_the_committing_transaction(db, post_id, published, monkeypatch, request):
+    monkeypatch.setattr(events, "EVENTS_BACKEND", "postgres")
+    notified = []
+
+    def add_pg_notify(connection):
+        # Stands in for Postgres' pg_notify on the SQLite connection
+        connection.connection.dbapi_connection.create_function("pg_notify", 2, lambda channel, message: notified.append((channel, message)))
+
+    event.listen(database.engine, "begin", add_pg_notify)
+    request.addfinalizer(lambda: event.remove(database.engine, "begin", add_pg_notify))
+
+    db_comment = models.Comment(content="Draft", post_id=post_id)
+    db.add(db_comment)
+    db.flush()
+    events.notify_comment_change(db, events.COMMENT_CREATED, db_comment)
+    db.rollback()
+    assert notified == []
+
+    db_comment = crud.create_comment(db, schemas.CommentCreate(content="See you there"), post_id)
+
+    assert [(channel, json.loads(message)["comment_id"]) for channel, message in notified] == [(events.COMMENT_CHANNEL, db_comment.id)]
+    assert published == []  # Delivered by the LISTEN side, not directly
@@ -0,0 +1,71 @@
+from api import crud, models
+
+
+def _seed_posts(db, count):
+    # Every post gets its own author, so a lazily loaded author would cost a query per post
+    for i in range(count):
+        author = models.User(username=f"admin{i}", email=f"admin{i}@example.com", display_name="Admin", hashed_password="x", is_admin=True, is_approved=True)
+        db.add(
+            models.Post(
+                title=f"Post {i}",
+                content="Barangay news",
+                author=author,
+                primary_image_url=f"https://cdn.example.com/{i}.jpg",
+                media=[models.Media(url=f"https://cdn.example.com/{i}-{j}.jpg", media_type="image") for j in range(3)],
+                comments=[models.Comment(content=f"Comment {j}") for j in range(2)],
+            )
+        )
+    db.commit()
+    db.expunge_all()
+
+
+def _feed_query_count(db, count_queries, load_page, limit):
+    with count_queries() as queries:
+        page = load_page(db, limit=limit)
+        # Touch everything a response serializes, so lazy loads would be counted too
+        for post in page:
+            post.author.username
+            [variant.url for variant in post.primary_image_variants]
+            [[variant.url for variant in media.variants] for media in post.media]
+    assert len(page) == limit
+    db.expunge_all()
+    return len(queries)
+
+
+def test_post_page_query_count_does_not_depend_on_page_size(db, count_queries):
+    _seed_posts(db, 20)
+
+    one = _feed_query_count(db, count_queries, crud.get_posts, limit=1)
+    twenty = _feed_query_count(db, count_queries, crud.get_posts, limit=20)
+
+    assert one == twenty
+
+
+def test_post_summary_page_query_count_does_not_depend_on_page_size(db, count_queries):
+    _seed_posts(db, 20)
+
+    one = _feed_query_count(db, count_queries, crud.get_post_summaries, limit=1)
+    twenty = _feed_query_count(db, count_queries, crud.get_post_summaries, limit=20)
+
+    assert one == twenty
+
+
+def test_single_post_query_count_does_not_depend_on_its_media_or_comments(db, count_queries):
+    _seed_posts(db, 2)
+    first, second = (post.id for post in db.query(models.Post).order_by(models.Post.id))
+    db.add_all(models.Comment(content="More", post_id=second) for _ in range(10))
+    db.add_all(models.Media(url=f"https://cdn.example.com/extra-{i}.jpg", media_type="image", post_id=second) for i in range(10))
+    db.commit()
+    db.expunge_all()
+
+    counts = []
+    for post_id in (first, second):
+        with count_queries() as queries:
+            post = crud.get_post(db, post_id=post_id)
+            post.author.username
+            [[variant.url for variant in media.variants] for media in post.media]
+            [comment.content for comment in post.comments]
+        counts.append(len(queries))
+        db.expunge_all()
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,44 @@
+import asyncio
+import io
+
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from api import images, storage
+
+
+def _image_bytes(size, mode="RGB", image_format="PNG", **save_options):
+    buffer = io.BytesIO()
+    Image.new(mode, size).save(buffer, format=image_format, **save_options)
+    return buffer.getvalue()
+
+
+def test_variants_are_never_upscaled_and_duplicate_widths_are_skipped():
+    widths = {"thumb": 320, "medium": 1024, "large": 2048}
+
+    rendered = images._render_variants(_image_bytes((640, 480)), widths, quality=80)
+
+    assert [(name, width, height) for name, width, height, _ in rendered] == [("thumb", 320, 240), ("medium", 640, 480)]
+    for _, width, height, body in rendered:
+        with Image.open(io.BytesIO(body)) as variant:
+            assert (variant.format, variant.size) == ("WEBP", (width, height))
+
+
+def test_transparent_palette_images_keep_their_alpha():
+    data = _image_bytes((200, 100), mode="P", transparency=0)
+
+    [(_, _, _, body)] = images._render_variants(data, {"thumb": 100}, quality=80)
+
+    with Image.open(io.BytesIO(body)) as variant:
+        assert variant.mode == "RGBA"
+        assert variant.size == (100, 50)
+
+
+def test_unprocessable_uploads_get_no_variants():
+    assert not images.can_process("image/gif")
+    assert not images.can_process("video/mp4")
+    upload = UploadFile(io.BytesIO(b"GIF89a"), filename="a.gif", headers=Headers({"content-type": "image/gif"}))
+
+    variants = asyncio.run(images.create_variants(upload, storage.StoredFile("media/a.gif", "http://testserver/storage/media/a.gif")))
+
+    assert variants == []
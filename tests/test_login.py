@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from api import security
+
+
+def _login(client, username, password):
+    return client.post("/token", data={"username": username, "password": password})
+
+
+def _completed_checks():
+    return security.password_hashing_stats()["completed"]
+
+
+@pytest.mark.parametrize("password", ["password123", "wrong password"])
+def test_offloaded_check_matches_the_sync_check(password):
+    hashed = security.get_password_hash("password123")
+
+    offloaded = asyncio.run(security.verify_and_update_password_offloaded(password, hashed))
+
+    assert offloaded == security.verify_and_update_password(password, hashed)
+    assert offloaded[0] is (password == "password123")
+
+
+def test_unknown_user_is_checked_against_a_dummy_hash():
+    assert asyncio.run(security.verify_and_update_password_offloaded("password123", None)) == (False, None)
+
+
+def test_every_login_attempt_runs_one_check_on_the_executor(client, admin_headers):
+    before = _completed_checks()
+
+    assert _login(client, "admin", "password123").status_code == 200
+    assert _login(client, "admin", "wrong password").status_code == 401
+    assert _login(client, "nobody", "password123").status_code == 401
+
+    assert _completed_checks() - before == 3
+
+
+def test_login_is_refused_while_the_executor_is_full(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_MAX_QUEUE", 0)
+    rejected = security.password_hashing_stats()["rejected"]
+
+    response = _login(client, "admin", "password123")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert security.password_hashing_stats()["rejected"] - rejected == 1
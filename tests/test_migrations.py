@@ -0,0 +1,28 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql
+
+from api import migrations, models
+from api.database import engine
+
+
+def _index_names(table_name):
+    return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+
+def test_create_schema_adds_missing_indexes_to_existing_tables():
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ix_document_requests_status_created_at_id"))
+
+    assert migrations.create_schema(engine) == ["ix_document_requests_status_created_at_id"]
+    assert "ix_document_requests_status_created_at_id" in _index_names("document_requests")
+    assert migrations.create_schema(engine) == []
+
+
+def test_postgres_indexes_are_built_concurrently():
+    dialect = postgresql.dialect()
+    indexes = {index.name: index for index in models.DocumentRequest.__table__.indexes}
+
+    statement = migrations.create_index_statement(indexes["ix_document_requests_status_created_at_id"], dialect)
+    assert statement.startswith("CREATE INDEX CONCURRENTLY ix_document_requests_status_created_at_id")
+    unique = migrations.create_index_statement(indexes["ix_document_requests_request_token"], dialect)
+    assert unique.startswith("CREATE UNIQUE INDEX CONCURRENTLY")
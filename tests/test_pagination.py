@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+
+from api import models
+from api.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+# Rows created in one transaction often share a timestamp; the id breaks the tie
+SAME_TIME = datetime(2026, 10, 1, 9, 30)
+
+
+def _follow_cursors(client, url, limit, headers=None):
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def post_ids(db):
+    user = models.User(username="author", email="author@example.com", display_name="Author", hashed_password="x")
+    posts = [models.Post(title=f"Post {i}", author=user, created_at=SAME_TIME) for i in range(5)]
+    posts.append(models.Post(title="Newest", author=user, created_at=datetime(2026, 10, 2)))
+    db.add_all(posts)
+    db.commit()
+    for i, post in enumerate(posts[:4]):
+        db.add(models.Comment(content=f"Comment {i}", post_id=post.id, created_at=SAME_TIME))
+    db.commit()
+    return [post.id for post in posts]
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(SAME_TIME, 42)) == (SAME_TIME, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_posts_page_through_tied_timestamps_without_gaps(client, post_ids):
+    pages = _follow_cursors(client, "/posts/", limit=2)
+
+    assert pages == [[post_ids[5], post_ids[4]], [post_ids[3], post_ids[2]], [post_ids[1], post_ids[0]], []]
+
+
+def test_comment_queue_pages_by_cursor(client, admin_headers, post_ids):
+    pages = _follow_cursors(client, "/admin/comments/", limit=3, headers=admin_headers)
+
+    assert [len(page) for page in pages] == [3, 1]
+    ids = [comment_id for page in pages for comment_id in page]
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_activity_log_cursor_only_works_when_sorting_by_timestamp(client, admin_headers):
+    client.post("/admin/posts/", json={"title": "Clean-up drive"}, headers=admin_headers)
+    cursor = encode_cursor(datetime(2100, 1, 1), 0)
+
+    by_time = client.get("/admin/logs/", params={"cursor": cursor}, headers=admin_headers)
+    by_action = client.get("/admin/logs/", params={"cursor": cursor, "sort_by": "action"}, headers=admin_headers)
+
+    assert by_time.status_code == 200 and by_time.json()
+    assert by_action.status_code == 400
+
+
+def test_malformed_cursor_is_a_bad_request(client):
+    assert client.get("/posts/", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,25 @@
+def _page_through_comments(client, post_id, page_size):
+    comments, skip = [], 0
+    while True:
+        response = client.get(f"/posts/{post_id}?comment_skip={skip}&comment_limit={page_size}")
+        page = response.json()["comments"]
+        comments += page
+        if len(page) < page_size:
+            return response.json()["comment_count"], comments
+        skip += page_size
+
+
+def test_comment_count_matches_the_comments_that_can_be_paged(client, admin_headers):
+    post_id = client.post("/admin/posts/", json={"title": "Clean-up drive"}, headers=admin_headers).json()["id"]
+    comment_ids = [
+        client.post(f"/posts/{post_id}/comments/", json={"content": f"Comment {i}"}).json()["id"]
+        for i in range(5)
+    ]
+    assert client.patch(f"/admin/comments/{comment_ids[1]}/flag", headers=admin_headers).status_code == 200
+
+    comment_count, comments = _page_through_comments(client, post_id, page_size=2)
+
+    assert comment_count == 4
+    assert len(comments) == comment_count
+    assert comment_ids[1] not in {comment["id"] for comment in comments}
+    assert not any(comment["is_inappropriate"] for comment in comments)
@@ -0,0 +1,70 @@
+# SQLite inserts the media rows one by one (Postgres batches them), so these
+# compare the reads, which is where lazy loading would show up
+
+
+def _post(media_count):
+    return {
+        "title": "Clean-up drive",
+        "content": "Saturday at the plaza",
+        "primary_image_url": "https://cdn.example.com/0.jpg",
+        "media": [{"url": f"https://cdn.example.com/{i}.jpg", "media_type": "image"} for i in range(media_count)],
+    }
+
+
+def test_create_post_query_count_does_not_grow_with_media(client, admin_headers, count_queries):
+    client.post("/admin/posts/", json=_post(1), headers=admin_headers)  # Warms the cached principal
+
+    with count_queries() as one:
+        response = client.post("/admin/posts/", json=_post(1), headers=admin_headers)
+    assert response.status_code == 201
+    with count_queries() as ten:
+        response = client.post("/admin/posts/", json=_post(10), headers=admin_headers)
+    assert response.status_code == 201
+
+    assert len(response.json()["media"]) == 10
+    assert response.json()["author"]["username"] == "admin"
+    assert len(ten.selects) == len(one.selects)
+
+
+def test_update_post_query_count_does_not_grow_with_media(client, admin_headers, count_queries):
+    post_id = client.post("/admin/posts/", json=_post(1), headers=admin_headers).json()["id"]
+    client.put(f"/admin/posts/{post_id}", json=_post(1), headers=admin_headers)
+
+    with count_queries() as one:
+        response = client.put(f"/admin/posts/{post_id}", json=_post(1), headers=admin_headers)
+    assert response.status_code == 200
+    with count_queries() as ten:
+        response = client.put(f"/admin/posts/{post_id}", json=_post(10), headers=admin_headers)
+    assert response.status_code == 200
+
+    assert [media["url"] for media in response.json()["media"]] == [f"https://cdn.example.com/{i}.jpg" for i in range(10)]
+    assert len(ten.selects) == len(one.selects)
+
+
+def test_create_post_reads_nothing_back(client, admin_headers, count_queries):
+    client.post("/admin/posts/", json=_post(1), headers=admin_headers)  # Warms the cached principal
+
+    with count_queries() as plain:
+        response = client.post("/admin/posts/", json={"title": "Clean-up drive"}, headers=admin_headers)
+    assert response.json()["comments"] == []
+    with count_queries() as with_images:
+        response = client.post("/admin/posts/", json=_post(3), headers=admin_headers)
+
+    assert response.json()["author"]["username"] == "admin"
+    assert plain.selects == []
+    # The only read looks up the image variants of the post's images
+    assert len(with_images.selects) == 1
+    assert "FROM image_variants" in with_images.selects[0]
+
+
+def test_update_post_only_loads_variants_of_new_images(client, admin_headers, count_queries):
+    post_id = client.post("/admin/posts/", json=_post(1), headers=admin_headers).json()["id"]
+
+    with count_queries() as text_only:
+        client.put(f"/admin/posts/{post_id}", json={"title": "Clean-up drive moved"}, headers=admin_headers)
+    with count_queries() as new_media:
+        response = client.put(f"/admin/posts/{post_id}", json=_post(2), headers=admin_headers)
+
+    assert response.json()["title"] == "Clean-up drive"
+    assert not any("FROM image_variants WHERE" in statement for statement in text_only.selects)
+    assert len(new_media.selects) == len(text_only.selects) + 1
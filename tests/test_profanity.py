@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from api.profanity import ProfanityMatch, ProfanityMatcher
+
+
+@pytest.fixture
+def words_file(tmp_path):
+    path = tmp_path / "swearwords.txt"
+    path.write_text("he\nshe\nhers\nhis\nass\n", encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def matcher(words_file):
+    return ProfanityMatcher(str(words_file))
+
+
+def test_overlapping_words_are_all_reported(matcher):
+    # "he" also ends inside "she" and starts "hers", but only whole words are reported
+    assert matcher.find_matches("she he hers") == [
+        ProfanityMatch(0, 3, "she"),
+        ProfanityMatch(4, 6, "he"),
+        ProfanityMatch(7, 11, "hers"),
+    ]
+
+
+def test_words_inside_longer_words_do_not_match(matcher):
+    assert matcher.find_matches("class passage ushers shell") == []
+    assert not matcher.contains_match("this")
+    assert matcher.find_matches("his_name") == []
+
+
+def test_punctuation_and_text_edges_are_word_boundaries(matcher):
+    assert matcher.find_matches("(his), ass!") == [ProfanityMatch(1, 4, "his"), ProfanityMatch(7, 10, "ass")]
+
+
+def test_matching_is_case_insensitive_and_keeps_the_original_text(matcher):
+    assert matcher.find_matches("Well SHE said Hers") == [ProfanityMatch(5, 8, "SHE"), ProfanityMatch(14, 18, "Hers")]
+
+
+def test_offsets_line_up_with_non_ascii_text(matcher):
+    text = "İ said ñ he"
+    assert matcher.find_matches(text) == [ProfanityMatch(9, 11, "he")]
+    assert text[9:11] == "he"
+
+
+def test_contains_match_stops_at_the_first_match(matcher):
+    assert matcher.contains_match("oh, he did")
+    assert not matcher.contains_match("")
+    assert not matcher.contains_match("nothing to see")
+
+
+def test_reload_picks_up_a_changed_word_list(words_file, matcher):
+    words_file.write_text("darn\n", encoding="utf-8")
+
+    assert matcher.reload() == 1
+    assert matcher.find_matches("he said darn") == [ProfanityMatch(8, 12, "darn")]
+
+
+def test_reload_if_changed_only_reloads_a_modified_file(words_file, matcher):
+    assert not matcher.reload_if_changed()
+
+    words_file.write_text("heck\n", encoding="utf-8")
+    stat = os.stat(words_file)
+    os.utime(words_file, (stat.st_atime, stat.st_mtime + 5))
+
+    assert matcher.reload_if_changed()
+    assert matcher.words == frozenset({"heck"})
+    assert matcher.contains_match("Heck no")
+
+
+def test_missing_word_list_matches_nothing(tmp_path):
+    matcher = ProfanityMatcher(str(tmp_path / "missing.txt"))
+
+    assert matcher.words == frozenset()
+    assert matcher.find_matches("she he hers") == []
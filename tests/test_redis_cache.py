@@ -0,0 +1,94 @@
+import time
+
+import fakeredis
+import pytest
+
+from api import cache
+
+
+@pytest.fixture
+def server():
+    server = fakeredis.FakeServer()
+    yield server
+    server.connected = True  # Lets leftover subscriber threads settle down quietly
+
+
+@pytest.fixture
+def connect(server, monkeypatch):
+    """Builds RedisCache instances (one per simulated worker) backed by the same fake Redis server."""
+    options = []
+
+    def from_url(url, **kwargs):
+        options.append(kwargs)
+        return fakeredis.FakeRedis(server=server)
+
+    monkeypatch.setattr(cache.redis.Redis, "from_url", from_url)
+
+    def build():
+        return cache.RedisCache("redis://fake", ttl=30, prefix="test:cache", socket_timeout=0.2)
+
+    build.options = options
+    return build
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_get_and_set(connect):
+    redis_cache = connect()
+    key = (cache.POSTS_NAMESPACE, "/posts/", ())
+
+    assert redis_cache.get(key) is None
+    redis_cache.set(key, b"[]", generation=redis_cache.generation(cache.POSTS_NAMESPACE))
+
+    assert redis_cache.get(key) == b"[]"
+    assert (redis_cache.hits, redis_cache.misses) == (1, 1)
+
+
+def test_invalidate_bumps_generation_and_drops_stale_writes(connect):
+    redis_cache = connect()
+    key = (cache.POSTS_NAMESPACE, "/posts/", ())
+    generation = redis_cache.generation(cache.POSTS_NAMESPACE)
+    redis_cache.set(key, b"old", generation=generation)
+
+    redis_cache.invalidate(cache.POSTS_NAMESPACE)
+
+    assert redis_cache.generation(cache.POSTS_NAMESPACE) == generation + 1
+    assert redis_cache.get(key) is None
+    # A value computed before the invalidation must not be put back
+    redis_cache.set(key, b"stale", generation=generation)
+    assert redis_cache.get(key) is None
+
+
+def test_invalidation_reaches_other_workers(connect):
+    first, second = connect(), connect()
+    key = (cache.POSTS_NAMESPACE, "/posts/", ())
+    invalidated = []
+    second.add_invalidation_listener(invalidated.append)
+    second.set(key, b"old", generation=second.generation(cache.POSTS_NAMESPACE))
+    assert first.get(key) == b"old"
+    # Let the subscriber thread subscribe before publishing
+    assert _wait_for(lambda: second._subscriber is not None and second.client.pubsub_numsub(second.channel)[0][1] > 0)
+
+    first.invalidate(cache.POSTS_NAMESPACE)
+
+    assert _wait_for(lambda: invalidated == [cache.POSTS_NAMESPACE])
+    assert second.generation(cache.POSTS_NAMESPACE) == first.generation(cache.POSTS_NAMESPACE)
+    assert second.get(key) is None
+
+
+def test_unreachable_redis_is_a_miss(connect, server):
+    redis_cache = connect()
+    key = (cache.POSTS_NAMESPACE, "/posts/", ())
+    server.connected = False
+
+    assert redis_cache.get(key) is None
+    redis_cache.set(key, b"[]")
+    assert redis_cache.errors >= 1
+    assert connect.options[-1] == {"socket_timeout": 0.2, "socket_connect_timeout": 0.2}
@@ -0,0 +1,88 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from api import crud, models
+from api.profanity import ProfanityMatcher
+
+
+@pytest.fixture
+def swear_words(tmp_path, monkeypatch):
+    words_file = tmp_path / "swearwords.txt"
+    words_file.write_text("darn\nheck\n", encoding="utf-8")
+    monkeypatch.setattr(crud, "profanity_matcher", ProfanityMatcher(str(words_file)))
+    return words_file
+
+
+@pytest.fixture
+def comments(db):
+    user = models.User(username="admin", email="admin@example.com", display_name="Admin", hashed_password="x")
+    posts = [models.Post(title="Clean-up drive", author=user), models.Post(title="Vaccination schedule", author=user)]
+    db.add_all(posts)
+    db.flush()
+
+    def comment(content, post=posts[0], flagged=False, day=1):
+        db_comment = models.Comment(
+            content=content, post_id=post.id, is_inappropriate=flagged,
+            created_at=datetime(2026, 10, day, tzinfo=timezone.utc),
+        )
+        db.add(db_comment)
+        return db_comment
+
+    created = {
+        "swear": comment("Well, darn it"),
+        "swear_other_post": comment("What the heck", post=posts[1]),
+        "swear_later": comment("Darn again", day=20),
+        "manually_flagged": comment("Nice plan", flagged=True),
+        "clean": comment("See you there"),
+    }
+    db.commit()
+    return {"post_ids": [post.id for post in posts], **{name: db_comment.id for name, db_comment in created.items()}}
+
+
+def _flags(db):
+    db.expire_all()
+    return {comment.id: comment.is_inappropriate for comment in db.query(models.Comment)}
+
+
+def test_rescan_flags_new_matches_and_keeps_manual_flags(db, swear_words, comments):
+    result = crud.rescan_comments(db)
+
+    assert result == {"scanned": 5, "flagged": 3, "unflagged": 0}
+    flags = _flags(db)
+    assert flags[comments["swear"]] and flags[comments["swear_other_post"]] and flags[comments["swear_later"]]
+    assert flags[comments["manually_flagged"]]
+    assert not flags[comments["clean"]]
+
+
+def test_rescan_unflags_clean_comments_when_asked(db, swear_words, comments):
+    swear_words.write_text("heck\n", encoding="utf-8")
+    crud.profanity_matcher.reload()
+    crud.rescan_comments(db)
+
+    result = crud.rescan_comments(db, unflag_clean=True)
+
+    assert result == {"scanned": 5, "flagged": 0, "unflagged": 1}
+    flags = _flags(db)
+    assert not flags[comments["manually_flagged"]]
+    assert flags[comments["swear_other_post"]]
+
+
+def test_rescan_filters_by_post_and_date(db, swear_words, comments):
+    by_post = crud.rescan_comments(db, post_id=comments["post_ids"][1])
+    assert by_post == {"scanned": 1, "flagged": 1, "unflagged": 0}
+
+    by_date = crud.rescan_comments(
+        db, start_date=datetime(2026, 10, 10, tzinfo=timezone.utc), end_date=datetime(2026, 10, 31, tzinfo=timezone.utc)
+    )
+    assert by_date == {"scanned": 1, "flagged": 1, "unflagged": 0}
+    assert not _flags(db)[comments["swear"]]
+
+
+def test_rescan_updates_in_batches(db, swear_words, comments, count_queries):
+    with count_queries() as queries:
+        result = crud.rescan_comments(db, unflag_clean=True, batch_size=2)
+
+    assert (result["flagged"], result["unflagged"]) == (3, 1)
+    updates = [statement for statement in queries.statements if statement.startswith("UPDATE comments")]
+    assert len(updates) == 2  # Four changes, at most two per statement
@@ -0,0 +1,32 @@
+from api import cache
+
+
+def test_undeclared_query_params_share_one_entry(client):
+    client.get("/posts/")
+    hits = cache.public_cache.hits
+    for i in range(20):
+        assert client.get(f"/posts/?x={i}").status_code == 200
+
+    assert cache.public_cache.stats()["size"] == 1
+    assert cache.public_cache.hits - hits == 20
+
+
+def test_declared_query_params_are_part_of_the_key(client):
+    hits = cache.public_cache.hits
+    client.get("/posts/?limit=5")
+    client.get("/posts/?limit=10")
+    client.get("/posts/?limit=10&limit=5")  # The endpoint receives limit=5
+
+    assert cache.public_cache.stats()["size"] == 2
+    assert cache.public_cache.hits - hits == 1
+
+
+def test_public_traffic_cannot_evict_cached_principals(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(cache.public_cache, "maxsize", 2)
+    client.get("/admin/cache/stats", headers=admin_headers)
+    for limit in range(1, 10):
+        client.get(f"/posts/?limit={limit}")
+
+    assert cache.public_cache.stats()["size"] == 2
+    assert cache.user_cache.stats()["size"] == 1
+    assert client.get("/admin/cache/stats", headers=admin_headers).json()["users"]["hits"] >= 1
@@ -0,0 +1,35 @@
+from api import search
+
+
+def test_highlight_escapes_the_text_around_and_inside_matches():
+    text = '<img src=x onerror="alert(1)"> Clean-up & <b>drive</b>'
+
+    assert search.highlight(text, ["drive", "clean"]) == (
+        "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; <mark>Clean</mark>-up &amp; &lt;b&gt;<mark>drive</mark>&lt;/b&gt;"
+    )
+    assert search.highlight("<b>no terms</b>", []) == "&lt;b&gt;no terms&lt;/b&gt;"
+
+
+def test_snippet_is_escaped():
+    text = "<script>alert(1)</script> " + "word " * 100 + "cleanup <i>drive</i>"
+
+    excerpt = search.snippet(text, ["cleanup"])
+
+    assert "<script>" not in excerpt and "<i>" not in excerpt
+    assert "<mark>cleanup</mark> &lt;i&gt;drive&lt;/i&gt;" in excerpt
+
+
+def test_headline_markers_are_only_swapped_in_after_escaping():
+    headline = f"<script>x</script> {search.HEADLINE_START}cleanup{search.HEADLINE_STOP} <mark>fake</mark>"
+
+    assert search.headline_html(headline) == "&lt;script&gt;x&lt;/script&gt; <mark>cleanup</mark> &lt;mark&gt;fake&lt;/mark&gt;"
+    assert search.headline_html(None) is None
+
+
+def test_search_results_are_escaped(client, admin_headers):
+    client.post("/admin/posts/", json={"title": "<script>alert(1)</script> Clean-up drive", "content": "Bring <b>gloves</b>"}, headers=admin_headers)
+
+    results = client.get("/posts/search", params={"q": "gloves"}).json()
+
+    assert results[0]["title_highlight"] == "&lt;script&gt;alert(1)&lt;/script&gt; Clean-up drive"
+    assert results[0]["snippet"] == "Bring &lt;b&gt;<mark>gloves</mark>&lt;/b&gt;"
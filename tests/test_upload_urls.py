@@ -0,0 +1,57 @@
+import httpx
+import pytest
+
+from api import storage
+
+BATCH_URL = "/admin/generate-upload-urls"
+SUPABASE_URL = "https://project.supabase.co"
+
+
+@pytest.fixture
+def signed_paths(monkeypatch):
+    """Points storage at a Supabase backend whose HTTP client answers sign requests locally."""
+    paths = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        path = request.url.path.split("/upload/sign/post-media/", 1)[1]
+        if path.endswith("broken.png"):
+            return httpx.Response(400, text="Invalid key")
+        paths.append(path)
+        return httpx.Response(200, json={"url": f"/object/upload/sign/post-media/{path}?token=t-{len(paths)}"})
+
+    backend = storage.SupabaseStorage(SUPABASE_URL, "service-key", "post-media")
+    backend._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(storage, "backend", backend)
+    return paths
+
+
+def test_batch_signs_every_file_in_request_order(client, admin_headers, signed_paths):
+    file_names = [f"photo-{i}.jpg" for i in range(5)]
+
+    response = client.post(BATCH_URL, json={"post_folder": "post-7", "file_names": file_names}, headers=admin_headers)
+
+    assert response.status_code == 200, response.text
+    assert [url["file_name"] for url in response.json()] == file_names
+    assert sorted(signed_paths) == [f"post-7/{name}" for name in file_names]
+    first = response.json()[0]
+    assert first["signed_url"].startswith(f"{SUPABASE_URL}/storage/v1/object/upload/sign/post-media/post-7/photo-0.jpg?token=")
+    assert first["public_url"] == f"{SUPABASE_URL}/storage/v1/object/public/post-media/post-7/photo-0.jpg"
+
+
+@pytest.mark.parametrize("count", [0, 51])
+def test_batch_size_is_limited(client, admin_headers, signed_paths, count):
+    file_names = [f"photo-{i}.jpg" for i in range(count)]
+
+    response = client.post(BATCH_URL, json={"post_folder": "post-7", "file_names": file_names}, headers=admin_headers)
+
+    assert response.status_code == 422
+    assert signed_paths == []
+
+
+def test_a_storage_error_fails_the_batch(client, admin_headers, signed_paths):
+    response = client.post(
+        BATCH_URL, json={"post_folder": "post-7", "file_names": ["a.png", "broken.png"]}, headers=admin_headers
+    )
+
+    assert response.status_code == 500
+    assert "broken.png" in response.json()["detail"]
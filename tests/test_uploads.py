@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import io
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from api import blobs, crud, models, storage
+
+UPLOAD_URL = "/admin/upload-announcement-image"
+
+
+def _png(size=(640, 480)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (200, 30, 30)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _stored_files():
+    root = storage.backend.root
+    return [os.path.join(folder, name) for folder, _, names in os.walk(root) for name in names]
+
+
+def test_local_storage_round_trip(tmp_path):
+    backend = storage.LocalStorage(str(tmp_path), "http://files.example.com/storage")
+
+    async def chunks():
+        yield b"hello "
+        yield b"world"
+
+    url = asyncio.run(backend.upload("media/greeting.txt", chunks(), content_type="text/plain"))
+
+    assert url == "http://files.example.com/storage/media/greeting.txt"
+    assert (tmp_path / "media" / "greeting.txt").read_bytes() == b"hello world"
+    assert [name for name in os.listdir(tmp_path / "media")] == ["greeting.txt"]  # No partial files left behind
+    assert backend.path_for_url(url) == "media/greeting.txt"
+    assert backend.path_for_url("https://elsewhere.example.com/media/greeting.txt") is None
+
+    asyncio.run(backend.delete(["media/greeting.txt", "media/missing.txt"]))
+    assert not (tmp_path / "media" / "greeting.txt").exists()
+
+
+def test_upload_is_stored_once_and_served_back(client, admin_headers, db):
+    image = _png()
+
+    first = client.post(UPLOAD_URL, files={"file": ("photo.PNG", image, "image/png")}, headers=admin_headers)
+    second = client.post(UPLOAD_URL, files={"file": ("copy.png", image, "image/png")}, headers=admin_headers)
+
+    assert first.status_code == 200, first.text
+    sha256 = hashlib.sha256(image).hexdigest()
+    assert first.json()["public_url"] == f"http://testserver/storage/media/{sha256}.png"
+    assert second.json() == first.json()
+    assert client.get(first.json()["public_url"]).content == image
+    assert {variant["name"] for variant in first.json()["variants"]}
+    for variant in first.json()["variants"]:
+        assert client.get(variant["url"]).headers["content-type"] == "image/webp"
+    db_blob = db.get(models.MediaBlob, sha256)
+    assert (db_blob.size, db_blob.path) == (len(image), f"media/{sha256}.png")
+
+
+def test_upload_over_limit_is_rejected_from_content_length(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(blobs, "MAX_UPLOAD_BYTES", 1024)
+    body = b"x" * (1024 + blobs.MULTIPART_OVERHEAD_BYTES + 1)
+
+    response = client.post(UPLOAD_URL, files={"file": ("big.png", body, "image/png")}, headers=admin_headers)
+
+    assert response.status_code == 413
+    assert _stored_files() == []
+
+
+def _upload_request(chunks, headers=None):
+    """A Request whose body arrives in the given chunks, like a chunked upload with no Content-Length."""
+    received = []
+    chunks = list(chunks)
+
+    async def receive():
+        received.append(1)
+        if len(received) > len(chunks):
+            return {"type": "http.disconnect"}
+        return {"type": "http.request", "body": chunks[len(received) - 1], "more_body": len(received) < len(chunks)}
+
+    raw_headers = [(b"content-type", b"multipart/form-data; boundary=b")] + (headers or [])
+    return Request({"type": "http", "method": "POST", "headers": raw_headers}, receive), received
+
+
+def _multipart(chunks):
+    yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="a.bin"\r\nContent-Type: application/octet-stream\r\n\r\n'
+    yield from chunks
+    yield b"\r\n--b--\r\n"
+
+
+async def _receive(request):
+    uploads = blobs.receive_upload(request)
+    upload = await uploads.__anext__()
+    return upload, uploads
+
+
+def test_streamed_upload_over_limit_is_rejected_while_arriving(monkeypatch):
+    monkeypatch.setattr(blobs, "MAX_UPLOAD_BYTES", 64 * 1024)
+    request, received = _upload_request(_multipart([b"x" * 16 * 1024] * 64))
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(_receive(request))
+
+    assert excinfo.value.status_code == 413
+    # The part headers and five 16 KB chunks pass the limit plus the multipart overhead
+    assert len(received) == 6
+
+
+def test_file_just_over_limit_is_rejected_after_parsing(monkeypatch):
+    monkeypatch.setattr(blobs, "MAX_UPLOAD_BYTES", 1024)
+    request, _ = _upload_request(_multipart([b"x" * 1025]))
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(_receive(request))
+
+    assert excinfo.value.status_code == 413
+
+
+def test_upload_is_hashed_and_rewound_for_storage():
+    data = os.urandom(300 * 1024)
+    request, _ = _upload_request(_multipart(data[start:start + 8192] for start in range(0, len(data), 8192)))
+
+    async def receive_and_read():
+        upload, uploads = await _receive(request)
+        content = await upload.file.read()
+        await uploads.aclose()
+        return upload, content
+
+    upload, content = asyncio.run(receive_and_read())
+
+    assert (upload.sha256, upload.size) == (hashlib.sha256(data).hexdigest(), len(data))
+    assert content == data
+
+
+def test_upload_without_file_field_is_rejected(client, admin_headers):
+    response = client.post(UPLOAD_URL, files={"other": ("a.png", b"abc", "image/png")}, headers=admin_headers)
+
+    assert response.status_code == 422
+
+
+def test_dereferenced_upload_survives_the_grace_period(client, admin_headers, db):
+    image = _png()
+    url = client.post(UPLOAD_URL, files={"file": ("photo.png", image, "image/png")}, headers=admin_headers).json()["public_url"]
+    post_id = client.post("/admin/posts/", json={"title": "Clean-up drive", "primary_image_url": url}, headers=admin_headers).json()["id"]
+    sha256 = hashlib.sha256(image).hexdigest()
+    # Pretend the upload and the post are old, so only the delete can keep the file
+    db.query(models.MediaBlob).update({"last_used_at": datetime.now(timezone.utc) - timedelta(days=1)})
+    db.commit()
+
+    assert client.delete(f"/admin/posts/{post_id}", headers=admin_headers).status_code == 200
+    db.expire_all()
+
+    assert crud.collect_orphan_media(db, grace_seconds=3600) == []
+    assert db.get(models.MediaBlob, sha256).ref_count == 0
+    assert url in crud.collect_orphan_media(db, grace_seconds=-60)
+
+
+def test_reupload_claims_the_stored_file_against_collection(client, admin_headers, db):
+    image = _png()
+    url = client.post(UPLOAD_URL, files={"file": ("photo.png", image, "image/png")}, headers=admin_headers).json()["public_url"]
+    sha256 = hashlib.sha256(image).hexdigest()
+    db.query(models.MediaBlob).update({"last_used_at": datetime.now(timezone.utc) - timedelta(days=1)})
+    db.commit()
+
+    # The same file is picked again in an edit form that has not been saved yet
+    again = client.post(UPLOAD_URL, files={"file": ("photo.png", image, "image/png")}, headers=admin_headers)
+    assert again.json()["public_url"] == url
+
+    assert crud.collect_orphan_media(db, grace_seconds=3600) == []
+    assert crud.collect_orphan_media(db, grace_seconds=-60) != []
+    assert crud.claim_media_blob(db, sha256) is None
+    # Once collected, the same upload stores the file again
+    stored = client.post(UPLOAD_URL, files={"file": ("photo.png", image, "image/png")}, headers=admin_headers)
+    assert stored.json()["public_url"] == url
+    assert client.get(url).content == image